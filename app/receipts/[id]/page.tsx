@@ -29,6 +29,10 @@ export default function ReceiptPage() {
   useEffect(() => {
     if (!id) return;
 
+    const isFinal = (status: string) => ["ready", "success", "error", "failed"].includes(status);
+    let interval: ReturnType<typeof setInterval> | undefined;
+    let source: EventSource | undefined;
+
     const checkStatus = async () => {
       try {
         const res = await fetch(`/api/status/${id}`);
@@ -39,24 +43,57 @@ export default function ReceiptPage() {
         const data = await res.json();
         setJob(data);
 
-        if (data.status === "ready" || data.status === "error") {
+        if (isFinal(data.status)) {
           setLoading(false);
+          clearInterval(interval);
         }
       } catch (err) {
         console.error(err);
         setError(err instanceof Error ? err.message : "Erreur inconnue");
         setLoading(false);
+        clearInterval(interval);
       }
     };
 
-    const interval = setInterval(() => {
-      if (loading) checkStatus();
-    }, 2000);
+    const startPolling = () => {
+      checkStatus();
+      interval = setInterval(checkStatus, 2000);
+    };
 
-    checkStatus();
+    const apiUrl = process.env.NEXT_PUBLIC_API_URL;
+    if (apiUrl && typeof EventSource !== "undefined") {
+      // The backend pushes each processing stage (SSE) instead of being polled
+      source = new EventSource(`${apiUrl}/status/${id}/events`);
+      source.addEventListener("status", (e) => {
+        const data = JSON.parse((e as MessageEvent).data);
+        setJob(data);
+        if (isFinal(data.status)) {
+          source?.close();
+          setLoading(false);
+        }
+      });
+      source.addEventListener("progress", (e) => {
+        const event = JSON.parse((e as MessageEvent).data);
+        if (isFinal(event.status)) {
+          source?.close();
+          // Read the final state (export URLs, error message); polls until
+          // the buffered status write has landed
+          startPolling();
+        }
+      });
+      source.onerror = () => {
+        // Closed for good (unknown job, stream not reachable): fall back to polling
+        if (source?.readyState === EventSource.CLOSED) startPolling();
+      };
+    } else {
+      startPolling();
+    }
 
-    return () => clearInterval(interval);
-  }, [id, loading]);
+    return () => {
+      source?.close();
+      clearInterval(interval);
+    };
+  }, [id]);
 
   if (loading && (!job || (job.status !== "ready" && job.status !== "error"))) {
     return (
@@ -9,10 +9,35 @@ class Settings(BaseSettings):
     # Supabase
     SUPABASE_URL: str | None = None
     SUPABASE_SERVICE_KEY: str | None = None
+    # Keep-alive HTTP pool shared by all DB/Storage calls (one sync, one async)
+    SUPABASE_MAX_CONNECTIONS: int = 20
+    SUPABASE_MAX_KEEPALIVE: int = 10
+    SUPABASE_TIMEOUT_SECONDS: float = 60.0
     
     # Google Cloud Vision
     GOOGLE_APPLICATION_CREDENTIALS_BASE64: str | None = None
-    
+    # Max number of blocking Vision calls running at once off the event loop
+    OCR_MAX_WORKERS: int = 8
+    # Scanned PDF pages sent per Vision batch request, and batches run in parallel
+    OCR_BATCH_SIZE: int = 8
+    OCR_PAGE_CONCURRENCY: int = 4
+    # Photos are downscaled / grayscaled / re-encoded before being sent to Vision
+    OCR_IMAGE_NORMALIZE: bool = True
+    OCR_IMAGE_MAX_DIMENSION: int = 2048
+    OCR_IMAGE_MAX_PIXELS: int = 60_000_000
+    OCR_IMAGE_QUALITY: int = 85
+    # Scanned PDF pages are rendered in worker processes (0 = in-process)
+    PDF_RENDER_WORKERS: int = 2
+    PDF_RENDER_DPI: int = 200
+    PDF_RENDER_FORMAT: str = "JPEG"  # JPEG, WEBP or PNG
+    # Batch PDF reports: detail rendered in worker processes (0 = in-process)
+    PDF_REPORT_WORKERS: int = 2
+    PDF_REPORT_CHUNK_SIZE: int = 1000
+    # OCR result cache (keyed by file content hash)
+    OCR_CACHE_MAX_ENTRIES: int = 512
+    OCR_CACHE_DISK: bool = True
+    OCR_CACHE_DIR: str | None = None
+
     # Google OAuth
     google_client_id: str | None = None
     google_client_secret: str | None = None
@@ -27,6 +52,19 @@ class Settings(BaseSettings):
             "openid"
         ]
 
+    # Uploads are refused past the max before their body is received, then
+    # read in chunks from Starlette's spool; files over the memory size are
+    # streamed to storage instead of being read whole
+    UPLOAD_MAX_BYTES: int = 20 * 1024 * 1024
+    UPLOAD_SPOOL_MEMORY_BYTES: int = 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 64 * 1024
+
+    # Bulk / ZIP upload (the max bytes also caps the whole request body)
+    BULK_UPLOAD_MAX_BYTES: int = 500 * 1024 * 1024
+    BULK_UPLOAD_MAX_FILES: int = 500
+    BULK_UPLOAD_CONCURRENCY: int = 8
+    BULK_PROCESS_CONCURRENCY: int = 4
+
     # Storage Buckets
     BUCKET_RAW: str = "receipts_raw"
     BUCKET_PDF: str = "receipts_pdf"
@@ -37,8 +75,65 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     FRONTEND_URL: str = "https://novareceipt.com"
 
+    # Job execution: "background" runs jobs inside the web process,
+    # "queue" stores them in jobs_processing for `python -m app.worker`
+    JOB_DISPATCH: str = "background"
+    WORKER_CONCURRENCY: int = 4
+    WORKER_LEASE_SECONDS: int = 300
+    WORKER_POLL_INTERVAL: float = 2.0
+    WORKER_MAX_ATTEMPTS: int = 3
+    # Window (seconds) during which job status writes are merged and batched
+    JOB_STATE_FLUSH_INTERVAL: float = 0.2
+    # Receipt rows kept in process for /status, /receipts/{id} and exports; written
+    # through by the pipeline, re-read after the TTL (other writers: frontend, Drive sync)
+    JOB_CACHE_MAX_ENTRIES: int = 2048
+    JOB_CACHE_TTL_SECONDS: int = 30
+    # Job progress events (SSE): "local" delivers within the web process only,
+    # "supabase" relays them over Realtime broadcast (needed with JOB_DISPATCH=queue)
+    EVENTS_BACKEND: str = "local"
+    EVENTS_CHANNEL: str = "job-progress"
+    # How long a job's recent events are kept for clients that connect late
+    EVENTS_REPLAY_TTL_SECONDS: int = 600
+    # An SSE stream is closed after this long (EventSource reconnects) and sends
+    # a keep-alive comment when it has been idle for EVENTS_HEARTBEAT_SECONDS
+    EVENTS_STREAM_MAX_SECONDS: int = 300
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    # How often the optional receipts / jobs_processing columns are re-probed
+    SCHEMA_PROBE_TTL_SECONDS: int = 600
+
     # OpenAI
     OPENAI_API_KEY: str | None = None
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    # OpenAI-compatible endpoint (None = api.openai.com), e.g. a local fake server
+    OPENAI_BASE_URL: str | None = None
+    # Max concurrent OpenAI requests per process (also the keep-alive pool size)
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    # Parsed results cached by normalized OCR text
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_TTL_SECONDS: int = 24 * 3600
+    # OCR text is compacted (noise, per-page headers/footers dropped) before prompting,
+    # then cut to this many estimated tokens keeping total/VAT/date lines
+    LLM_COMPACT_OCR_TEXT: bool = True
+    LLM_PROMPT_MAX_OCR_TOKENS: int = 1500
+    # Bulk uploads are parsed through the Batch API (`python -m app.worker --llm-batches`):
+    # half price, results within the 24h completion window
+    LLM_BATCH_ENABLED: bool = False
+    # Receipts per batch file; a smaller batch is sent once its oldest receipt waited this long
+    LLM_BATCH_MAX_REQUESTS: int = 500
+    LLM_BATCH_MAX_WAIT_SECONDS: int = 600
+    LLM_BATCH_POLL_INTERVAL: float = 60.0
+    # Batches a receipt can go through (expired/cancelled before it ran) before it is failed
+    LLM_BATCH_MAX_ATTEMPTS: int = 3
+
+    # Local heuristic parser runs first; the LLM is only called when one of
+    # these field confidences (0-1) is below its threshold
+    PARSER_FAST_PATH_ENABLED: bool = True
+    PARSER_MIN_MERCHANT_CONFIDENCE: float = 0.85
+    PARSER_MIN_AMOUNT_CONFIDENCE: float = 0.85
+    PARSER_MIN_DATE_CONFIDENCE: float = 0.85
+    # Share of fast-path receipts also sent to the LLM to measure agreement
+    PARSER_SHADOW_SAMPLE_RATE: float = 0.0
 
     def validate_env(self):
         """
@@ -1,15 +1,16 @@
-from fastapi import FastAPI, UploadFile, File, Request
+from fastapi import FastAPI, UploadFile, File, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from google.cloud import vision
 import os
+import asyncio
 import base64
 import tempfile
 
 # --- Relative Imports ---
 from .config import settings
 from .routers import upload, status, receipts, drive
-from app.services.ocr import ocr_service
-from app.services.llm_parser import get_llm_parser_service
+from app.services import registry
+from app.services.registry import get_ocr_service, get_jobs_service
+from app.utils.ingest import UploadLimitMiddleware, spool_upload
 # ------------------------
 
 # --- Google Cloud Credentials Setup for Render ---
@@ -41,6 +42,15 @@ app = FastAPI(
     # root_path="/api/py" if os.environ.get("VERCEL") else os.getenv("FASTAPI_ROOT_PATH", "")
 )
 
+# Refuses oversized uploads before their body is received. Added before
+# strip_api_prefix so it runs inside it and sees the stripped path.
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/upload": settings.UPLOAD_MAX_BYTES,
+    "/upload/bulk": settings.BULK_UPLOAD_MAX_BYTES,
+    "/anonymous/scan": settings.UPLOAD_MAX_BYTES,
+    "/ocr": settings.UPLOAD_MAX_BYTES,
+})
+
 @app.middleware("http")
 async def strip_api_prefix(request: Request, call_next):
     """
@@ -70,6 +80,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include Routers
@@ -78,68 +89,59 @@ app.include_router(status.router, tags=["Status"])
 app.include_router(receipts.router, tags=["Receipts"])
 app.include_router(drive.router, tags=["Drive"])
 
+@app.on_event("startup")
+async def probe_schema():
+    # Learn which optional columns exist before the first job writes.
+    # Not awaited: startup (and the first request) shouldn't wait on it.
+    app.state.schema_probe = asyncio.create_task(
+        asyncio.to_thread(lambda: get_jobs_service().schema.refresh())
+    )
+
+@app.on_event("startup")
+async def start_event_bus():
+    if settings.EVENTS_BACKEND != "local":
+        # Listen for progress events of jobs running in the workers.
+        # Not awaited, like the schema probe.
+        app.state.event_bus_start = asyncio.create_task(registry.get_event_bus().start())
+
+@app.on_event("shutdown")
+async def close_clients():
+    # Only services that were actually used have anything to release
+    llm_service = registry.peek("llm_parser")
+    if llm_service is not None:
+        # Release the pooled keep-alive connections of the async OpenAI client
+        await llm_service.aclose()
+    event_bus = registry.peek("events")
+    if event_bus is not None:
+        await event_bus.close()
+    jobs_service = registry.peek("jobs")
+    if jobs_service is not None:
+        # Write out buffered job state before the process exits
+        jobs_service.flush()
+    db = registry.peek("supabase")
+    if db is not None:
+        await db.aclose()
+        db.close()
+
 @app.get("/")
 def root():
     return {"status": "backend running"}
 
-# Initialize Google Vision Client (Global for simple endpoint)
-try:
-    # This must happen AFTER the credential setup above
-    vision_client = vision.ImageAnnotatorClient()
-except Exception as e:
-    print(f"Warning: Could not initialize global Vision client: {e}")
-    vision_client = None
-
-@app.post("/anonymous/scan")
-async def anonymous_scan(file: UploadFile = File(...)):
-    """
-    Anonymous OCR scan endpoint.
-    - Receives file
-    - Performs OCR (Google Vision)
-    - Parses with LLM (OpenAI)
-    - Returns structured JSON
-    - NO DB Storage
-    # GUARANTEE: This endpoint MUST NOT save the file or data to any persistent storage (DB, S3, etc.)
-    # It is strictly for anonymous, on-the-fly processing.
-    """
-    try:
-        content = await file.read()
-        
-        # 1. OCR
-        text = ocr_service.extract_text_from_image(content)
-        if not text:
-             return {"error": "No text detected in image"}
-        
-        # 2. LLM Parsing
-        receipt_data = get_llm_parser_service().parse_receipt_with_llm(text)
-        
-        # 3. Return Data (No DB save)
-        return receipt_data
-    except Exception as e:
-        print(f"Anonymous Scan Error: {e}")
-        return {"error": str(e)}
-
 @app.post("/ocr")
 async def ocr_receipt(file: UploadFile = File(...)):
     """
     Simple direct OCR endpoint for testing/debugging.
     """
-    if not vision_client:
-        return {"error": "Google Vision Client not initialized. Check server logs."}
-
-    content = await file.read()
-
-    image = vision.Image(content=content)
-    # Using document_text_detection as requested
-    response = vision_client.document_text_detection(image=image)
-    
-    if response.error.message:
-        return {"error": f"Google Vision API Error: {response.error.message}"}
-
-    if not response.full_text_annotation:
-        return {"text": ""}
-
-    text = response.full_text_annotation.text
+    # Using document_text_detection as requested (cached by content hash)
+    try:
+        with await spool_upload(file) as upload:
+            content = upload.read_bytes()
+        text = await get_ocr_service().extract_document_text_async(content, content_hash=upload.md5)
+    except HTTPException:
+        # Upload over UPLOAD_MAX_BYTES (413)
+        raise
+    except Exception as e:
+        return {"error": str(e)}
 
     return {"text": text}
 
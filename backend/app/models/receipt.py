@@ -32,6 +32,16 @@ class ReceiptData(BaseModel):
     document_type: Literal["invoice", "receipt", "other"] = Field("receipt", description="The type of document.")
     confidence: float = Field(0.0, description="A confidence score between 0.0 and 1.0.")
 
+class ProcessRequest(BaseModel):
+    receipt_id: str
+    file_path: str
+    file_type: str
+    user_id: str
+    email: Optional[str] = None
+    trace_id: Optional[str] = None
+    # Parse through the LLM Batch API when the heuristics are not enough (bulk jobs)
+    llm_batch: bool = False
+
 class JobStatus(BaseModel):
     job_id: str
     status: str  # pending, processing, ready, error
@@ -1,21 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
+import asyncio
 import base64
 from app.services.google_drive import GoogleDriveService, get_auth_flow, is_drive_enabled
-from app.config import settings
-from supabase import create_client, Client
+from app.services.registry import get_supabase
 
 router = APIRouter(prefix="/drive", tags=["drive"])
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
 
 # Dependencies
 def get_current_user(user_id: str = Query(..., description="The user ID")):
     return {"id": user_id}
 
-def get_supabase_client():
-    return supabase
-
 def check_drive_enabled():
     if not is_drive_enabled():
         raise HTTPException(status_code=503, detail="Google Drive integration is not enabled (missing dependencies or configuration)")
@@ -32,7 +28,7 @@ class ExchangeRequest(BaseModel):
 @router.get("/status")
 async def drive_status(
     user = Depends(get_current_user),
-    supabase_client = Depends(get_supabase_client),
+    db = Depends(get_supabase),
 ):
     if not is_drive_enabled():
         return {"connected": False, "disabled": True}
@@ -40,16 +36,15 @@ async def drive_status(
     try:
         print(f"Checking drive status for user_id: {user['id']}")
         # Check if token exists for user
-        resp = (
-            supabase_client.table("google_drive_tokens")
+        resp = await db.execute(
+            lambda c: c.table("google_drive_tokens")
             .select("id")
             .eq("user_id", user["id"])
             .maybe_single()
-            .execute()
         )
         
-        print(f"Supabase response for {user['id']}: {resp.data}")
-        connected = resp.data is not None
+        print(f"Supabase response for {user['id']}: {resp and resp.data}")
+        connected = resp is not None and resp.data is not None
         return {"connected": connected}
     except Exception as e:
         print(f"Drive status check error: {e}")
@@ -96,13 +91,14 @@ async def auth_exchange(request: ExchangeRequest):
 
         print(f"Upserting to Supabase: {data.keys()}")
         
-        result = supabase.table("google_drive_tokens").upsert(data).execute()
+        result = await get_supabase().execute(lambda c: c.table("google_drive_tokens").upsert(data))
         print(f"Supabase upsert result: {result}")
 
         # Initialize folder immediately
         try:
-            drive_service = GoogleDriveService(request.user_id)
-            drive_service.initialize_storage()
+            # The Google API client is blocking: keep it off the event loop
+            drive_service = await asyncio.to_thread(GoogleDriveService, request.user_id)
+            await asyncio.to_thread(drive_service.initialize_storage)
             print("Folder initialization successful")
         except Exception as e:
             print(f"Failed to initialize folder: {e}")
@@ -131,11 +127,11 @@ async def upload_to_drive(request: UploadRequest):
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid base64 string")
         
-        drive_service = GoogleDriveService(request.user_id)
+        drive_service = await asyncio.to_thread(GoogleDriveService, request.user_id)
         if not drive_service.service:
              raise HTTPException(status_code=400, detail="Google Drive not connected for this user")
              
-        result = drive_service.upload_file(request.filename, file_content)
+        result = await asyncio.to_thread(drive_service.upload_file, request.filename, file_content)
         return result
     except HTTPException as he:
         raise he
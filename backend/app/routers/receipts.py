@@ -1,15 +1,53 @@
-from fastapi import APIRouter, HTTPException, Query
-from app.services.jobs import jobs_service
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from app.services.registry import (
+    get_jobs_service, get_excel_export_service, get_pdf_export_service, get_receipt_export_service,
+    get_artifacts_service
+)
+from app.services.excel_export import EXPORT_COLUMNS
+from app.services.pdf_export import REPORT_COLUMNS
+from app.services.receipt_exports import EXPORT_FORMATS, ReceiptNotReadyError
+from app.utils.pagination import encode_cursor, decode_cursor
 from typing import List, Optional
+from datetime import datetime
+import asyncio
+import os
+import tempfile
 
 router = APIRouter()
 
+# Only what the list returns: raw_json (OCR text, debug logs) stays in the database
+LIST_COLUMNS = ("id", "created_at", "merchant", "date", "amount", "currency", "category", "excel_url", "pdf_url", "file_path")
+MAX_LIST_LIMIT = 200
+
 @router.get("/receipts")
-async def list_receipts(limit: int = 50, user_id: Optional[str] = None):
+async def list_receipts(
+    response: Response,
+    limit: int = 50,
+    user_id: Optional[str] = None,
+    cursor: Optional[str] = None
+):
     """
-    List all processed receipts.
+    List processed receipts, newest first.
+    When more receipts follow, the X-Next-Cursor response header holds the
+    `cursor` to pass for the next page.
     """
-    jobs = jobs_service.get_all_jobs(limit=limit, user_id=user_id)
+    limit = max(1, min(limit, MAX_LIST_LIMIT))
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    jobs_service = get_jobs_service()
+    columns = await asyncio.to_thread(jobs_service.select_columns, LIST_COLUMNS)
+    # One extra row tells whether there is a next page
+    jobs = await jobs_service.get_all_jobs_async(limit=limit + 1, user_id=user_id, columns=columns, after=after)
+    if len(jobs) > limit:
+        jobs = jobs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(jobs[-1])
     
     results = []
     for job in jobs:
@@ -29,11 +67,55 @@ async def list_receipts(limit: int = 50, user_id: Optional[str] = None):
         
     return results
 
+@router.get("/receipts/export/xlsx")
+async def export_receipts_xlsx(user_id: str, status: Optional[str] = "success"):
+    """
+    Exports all of a user's receipts as one workbook (Receipts + Line Items).
+    Receipts are paged from the database and streamed into a temp file.
+    """
+    fd, path = tempfile.mkstemp(prefix="receipts_export_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        rows = get_jobs_service().iter_jobs(user_id=user_id, columns=EXPORT_COLUMNS, status=status or None)
+        await asyncio.to_thread(get_excel_export_service().write_receipts, rows, path)
+    except Exception as e:
+        os.remove(path)
+        print(f"Error exporting receipts for {user_id}: {e}")
+        raise HTTPException(status_code=500, detail="Export failed")
+
+    filename = f"receipts_{datetime.utcnow().strftime('%Y%m%d')}.xlsx"
+    return FileResponse(
+        path,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=filename,
+        background=BackgroundTask(os.remove, path)
+    )
+
+@router.get("/receipts/export/pdf")
+async def export_receipts_pdf(user_id: str, status: Optional[str] = "success"):
+    """
+    Expense report for all of a user's receipts: per-category subtotals
+    followed by the receipts grouped by category.
+    """
+    try:
+        rows = get_jobs_service().iter_jobs(user_id=user_id, columns=REPORT_COLUMNS, status=status or None)
+        pdf_bytes = await asyncio.to_thread(get_pdf_export_service().generate_report, rows)
+    except Exception as e:
+        print(f"Error generating report for {user_id}: {e}")
+        raise HTTPException(status_code=500, detail="Report generation failed")
+
+    filename = f"expense_report_{datetime.utcnow().strftime('%Y%m%d')}.pdf"
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/receipts/{receipt_id}")
 async def get_receipt(receipt_id: str):
     # TODO: Implement fetching from 'receipts' table
     # For now, let's try to find a job with this ID (assuming job_id == receipt_id for simplicity in MVP)
-    job = jobs_service.get_job(receipt_id)
+    job = await get_jobs_service().get_job_async(receipt_id, columns="id,status")
     
     if not job:
         raise HTTPException(status_code=404, detail="Receipt not found")
@@ -45,18 +127,34 @@ async def get_receipt(receipt_id: str):
         "data": "Structured data would be here if saved to DB"
     }
 
+@router.get("/receipts/{receipt_id}/artifacts")
+async def get_receipt_artifacts(receipt_id: str):
+    """
+    OCR text and processing trace of a receipt. Kept out of the receipts
+    row, so only loaded when asked for (debug views, reprocessing).
+    """
+    artifacts = await get_artifacts_service().load_async(receipt_id)
+    if not artifacts:
+        raise HTTPException(status_code=404, detail="No artifacts for this receipt")
+    return {"receipt_id": receipt_id, **artifacts}
+
 @router.get("/receipts/{receipt_id}/download")
 async def get_download_link(receipt_id: str, format: str = "pdf"):
-    job = jobs_service.get_job(receipt_id)
-    if not job:
+    """
+    URL of the receipt's PDF or Excel export. Generated and uploaded on the
+    first request, then served from storage until the receipt changes.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+
+    try:
+        url = await get_receipt_export_service().get_export_url(receipt_id, format)
+    except LookupError:
         raise HTTPException(status_code=404, detail="Receipt not found")
-        
-    if format == "excel":
-        url = job.get("excel_url")
-    else:
-        url = job.get("pdf_url")
-        
-    if not url:
-        raise HTTPException(status_code=404, detail=f"No {format} file available for this receipt")
-        
+    except ReceiptNotReadyError:
+        raise HTTPException(status_code=409, detail="Receipt is not processed yet")
+    except Exception as e:
+        print(f"[{receipt_id}] Export generation failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Could not generate {format} file")
+
     return {"url": url}
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, HTTPException
-from app.services.jobs import jobs_service
-from app.services.llm_parser import get_llm_parser_service
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.services.events import FINAL_STATUSES
+from app.services.registry import get_jobs_service, get_llm_parser_service, get_receipt_parser_service, get_event_bus
+from app.services.ocr_cache import ocr_cache
 
 router = APIRouter()
 
@@ -9,24 +14,94 @@ async def health_check():
     llm_service = get_llm_parser_service()
     return {
         "status": "ok",
-        "ai_available": llm_service.is_available()
+        "ai_available": llm_service.is_available(),
+        "ocr_cache": ocr_cache.stats(),
+        "llm_cache": llm_service.cache.stats(),
+        "llm_prompt": llm_service.prompt_stats(),
+        "parser": get_receipt_parser_service().stats(),
+        "job_state_writer": get_jobs_service().writer.stats(),
+        "job_cache": get_jobs_service().cache.stats(),
+        "events": get_event_bus().stats()
     }
 
-@router.get("/status/{job_id}")
-async def check_status(job_id: str):
-    job = jobs_service.get_job(job_id)
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    receipt_data = job.get("receipt_data") or {}
-    
+def _job_status(job: dict) -> dict:
     return {
-        "job_id": job["job_id"],
+        "job_id": job["id"],
         "status": job["status"],
         "file_url": job.get("file_url"),
         "excel_url": job.get("excel_url"),
         "pdf_url": job.get("pdf_url"),
         "error": job.get("error"),
         "created_at": job.get("created_at"),
-        "receipt_data": receipt_data
+        "receipt_data": job.get("receipt_data") or {}
     }
+
+@router.get("/status/{job_id}")
+async def check_status(job_id: str):
+    job = await get_jobs_service().get_job_async(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_status(job)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.get("/status/{job_id}/events")
+async def stream_status(job_id: str, request: Request):
+    """
+    Server-sent events for one job: a "status" event with the current state
+    (same body as /status/{job_id}), then a "progress" event per pipeline
+    stage as it happens, until the job succeeds or fails. Replaces polling:
+    the database is read once per connection.
+    """
+    # Subscribe before reading the row so no stage falls in between
+    subscription = get_event_bus().subscribe(job_id)
+    try:
+        job = await get_jobs_service().get_job_async(job_id)
+    except Exception:
+        subscription.close()
+        raise
+    if not job:
+        subscription.close()
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        try:
+            snapshot = _job_status(job)
+            yield _sse("status", snapshot)
+            if snapshot["status"] in FINAL_STATUSES:
+                return
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + settings.EVENTS_STREAM_MAX_SECONDS
+            while not await request.is_disconnected():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    # EventSource reconnects and gets a fresh snapshot
+                    return
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.get(), timeout=min(settings.EVENTS_HEARTBEAT_SECONDS, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse("progress", event)
+                if event["status"] in FINAL_STATUSES:
+                    return
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # No caching, and no response buffering by nginx-style proxies
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/batches/{batch_id}")
+async def batch_status(batch_id: str):
+    batch = await get_jobs_service().get_batch_status_async(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
@@ -1,21 +1,23 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Form
-from app.services.storage import get_storage_service
-from app.services.jobs import jobs_service
-from app.services.ocr import ocr_service
-from app.services.llm_parser import get_llm_parser_service
-from app.services.excel_export import excel_export_service
-from app.services.pdf_export import pdf_export_service
+from app.services.registry import (
+    get_storage_service, get_jobs_service, get_job_queue, get_ocr_service, get_receipt_parser_service,
+    get_artifacts_service, get_llm_batch_service, get_event_bus
+)
+from app.services.events import job_event
 from app.utils.parsing import parse_amount
+from app.models.receipt import ProcessRequest
+from app.utils.ingest import spool_upload
 from app.config import settings
 import uuid
+import asyncio
+import mimetypes
+import zipfile
 import traceback
 import hashlib
-import httpx
 import json
 import re
 from datetime import datetime
-from typing import Optional, Any
-from pydantic import BaseModel
+from typing import List, Optional, Any
 
 router = APIRouter()
 
@@ -41,15 +43,75 @@ def normalize_date(value: Any) -> Optional[str]:
         
     return None
 
-class ProcessRequest(BaseModel):
-    receipt_id: str
-    file_path: str
-    file_type: str
-    user_id: str
-    email: Optional[str] = None
-    trace_id: Optional[str] = None
+def make_event_logger(debug_info: dict):
+    """
+    log_event(stage, data, status="processing", **progress): appends an entry
+    to the job trace, prints it, and publishes the stage to the job's progress
+    listeners (SSE). Listeners get the status and `progress` fields, never the
+    trace data (OCR preview, traceback).
+    """
+    def log_event(stage: str, data: dict, status: str = "processing", **progress):
+        entry = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "stage": stage,
+            "data": data
+        }
+        debug_info["logs"].append(entry)
+        print(f"[{debug_info.get('trace_id')}] [{stage}] {json.dumps(data, default=str)}")
+        event = job_event(stage, status, **progress)
+        event["timestamp"] = entry["timestamp"]
+        get_event_bus().publish(debug_info["receipt_id"], event)
+    return log_event
+
+async def finish_receipt_job(job_id: str, receipt_data, text: str, debug_info: dict, log_event):
+    """
+    Normalizes, validates and stores a parsed receipt (end of the pipeline,
+    also used when an LLM batch result arrives). Raises on invalid data.
+    """
+    # 3. Normalization & Validation
+    # Amount
+    original_amount = receipt_data.amount
+    receipt_data.amount = parse_amount(receipt_data.amount)
+    
+    # Date
+    original_date = receipt_data.date
+    receipt_data.date = normalize_date(receipt_data.date)
+    
+    log_event("NORMALIZATION", {
+        "amount_raw": original_amount,
+        "amount_parsed": receipt_data.amount,
+        "date_raw": original_date,
+        "date_parsed": receipt_data.date
+    })
+
+    # Guardrail: Amount
+    if receipt_data.amount is None:
+         # We treat this as an error as requested
+         raise ValueError("AMOUNT_PARSE_FAIL: Could not extract valid amount")
+
+    # 4. Update DB
+    receipt_dict = receipt_data.model_dump()
 
-async def process_receipt_job_v2(request: ProcessRequest):
+    # OCR text and the trace go to the compressed side table; the
+    # receipts row only keeps the structured fields
+    if await get_artifacts_service().save_async(job_id, ocr_text=text, debug=debug_info):
+        get_jobs_service().mark_job_ready(job_id, excel_url=None, pdf_url=None, receipt_data=receipt_dict)
+    else:
+        # Side table unavailable: keep them inline rather than lose them
+        receipt_dict["raw_json"] = {"_debug": debug_info, "ocr_text": text}
+        get_jobs_service().mark_job_ready(job_id, excel_url=None, pdf_url=None, receipt_data=receipt_dict, ocr_text=text)
+    # The result goes with the event so the client doesn't have to read it back
+    log_event(
+        "SUCCESS", {"msg": "Job completed successfully"},
+        status="success", receipt_data=receipt_data.model_dump(mode="json")
+    )
+
+async def process_receipt_job_v2(request: ProcessRequest, raise_errors: bool = False):
+    """
+    Runs the full pipeline for one receipt. By default failures are recorded
+    on the receipt; with raise_errors the exception is re-raised instead so
+    the caller (the queue worker) can decide whether to retry.
+    """
     storage_service = get_storage_service()
     job_id = request.receipt_id
     trace_id = request.trace_id or str(uuid.uuid4())
@@ -61,30 +123,24 @@ async def process_receipt_job_v2(request: ProcessRequest):
         "logs": []
     }
     
-    def log_event(stage: str, data: dict):
-        entry = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "stage": stage,
-            "data": data
-        }
-        debug_info["logs"].append(entry)
-        print(f"[{trace_id}] [{stage}] {json.dumps(data, default=str)}")
+    log_event = make_event_logger(debug_info)
 
+    text = None
     try:
         log_event("START", {"file_path": request.file_path, "file_type": request.file_type})
         
         # Update receipts table status
-        jobs_service.update_job_status(job_id, "processing")
+        get_jobs_service().update_job_status(job_id, "processing")
 
         # Download file
-        file_bytes = storage_service.download_file(settings.BUCKET_RAW, request.file_path)
+        file_bytes = await storage_service.download_file_async(settings.BUCKET_RAW, request.file_path)
         
         # Calculate checksum
         file_hash = hashlib.md5(file_bytes).hexdigest()
         log_event("DOWNLOAD", {"size": len(file_bytes), "md5": file_hash})
 
         # 1. OCR
-        text = ocr_service.extract_text(file_bytes, mime_type=request.file_type)
+        text = await get_ocr_service().extract_text_async(file_bytes, mime_type=request.file_type, content_hash=file_hash)
         text_len = len(text) if text else 0
         log_event("OCR", {"length": text_len, "preview": text[:200] if text else ""})
         
@@ -92,59 +148,40 @@ async def process_receipt_job_v2(request: ProcessRequest):
         if text_len < 10:
             raise ValueError("OCR_EMPTY: Text too short or empty")
         
-        # 2. Parse with LLM
-        receipt_data = get_llm_parser_service().parse_receipt_with_llm(text)
-        log_event("LLM_PARSE", receipt_data.model_dump())
-        
-        # 3. Normalization & Validation
-        # Amount
-        original_amount = receipt_data.amount
-        receipt_data.amount = parse_amount(receipt_data.amount)
-        
-        # Date
-        original_date = receipt_data.date
-        receipt_data.date = normalize_date(receipt_data.date)
-        
-        log_event("NORMALIZATION", {
-            "amount_raw": original_amount,
-            "amount_parsed": receipt_data.amount,
-            "date_raw": original_date,
-            "date_parsed": receipt_data.date
-        })
-
-        # Guardrail: Amount
-        if receipt_data.amount is None:
-             # We treat this as an error as requested
-             raise ValueError("AMOUNT_PARSE_FAIL: Could not extract valid amount")
-
-        # 4. Update DB
-        receipt_dict = receipt_data.model_dump()
-        
-        # Inject debug info into raw_json
-        if not receipt_dict.get("raw_json"):
-            receipt_dict["raw_json"] = {}
-        elif not isinstance(receipt_dict["raw_json"], dict):
-             receipt_dict["raw_json"] = {"original": receipt_dict["raw_json"]}
-             
-        receipt_dict["raw_json"]["_debug"] = debug_info
-        receipt_dict["raw_json"]["ocr_text"] = text
+        # 2. Parse: local heuristics, LLM when they are not confident enough
+        receipt_data, decision = await get_receipt_parser_service().parse_async(text, defer_llm=request.llm_batch)
+        log_event("PARSE", {"decision": decision, "result": receipt_data.model_dump(mode="json")}, source=decision["source"])
 
-        jobs_service.mark_job_ready(job_id, excel_url=None, pdf_url=None, receipt_data=receipt_dict, ocr_text=text)
-        log_event("SUCCESS", {"msg": "Job completed successfully"})
+        if decision["source"] == "llm_batch":
+            # Finished by the batch runner once the Batch API result is in
+            log_event("LLM_BATCH", {"msg": "Queued for batch parsing"})
+            await get_llm_batch_service().defer_async(request, text, debug_info)
+            return
+
+        await finish_receipt_job(job_id, receipt_data, text, debug_info, log_event)
 
     except Exception as e:
         error_msg = str(e)
         tb = traceback.format_exc()
-        log_event("ERROR", {"error": error_msg, "traceback": tb})
+        # With raise_errors the worker may still retry: only it knows when the job failed for good
+        log_event(
+            "ERROR", {"error": error_msg, "traceback": tb},
+            status="processing" if raise_errors else "failed", error=error_msg
+        )
+        # Keep the failed run's trace next to the receipt for debugging
+        await get_artifacts_service().save_async(job_id, ocr_text=text, debug=debug_info)
+
+        if raise_errors:
+            raise
         
         # Update DB with error
-        jobs_service.mark_job_error(job_id, error_msg)
+        get_jobs_service().mark_job_error(job_id, error_msg)
 @router.get("/debug/receipt/{receipt_id}")
 async def debug_receipt(receipt_id: str):
     """
     Returns the raw Supabase row for a receipt to verify its state.
     """
-    job = jobs_service.get_job(receipt_id)
+    job = await get_jobs_service().get_job_async(receipt_id, use_cache=False)
     if not job:
         raise HTTPException(status_code=404, detail="Receipt not found")
     return job
@@ -154,8 +191,9 @@ async def scan_anonymous(file: UploadFile = File(...)):
     job_id = str(uuid.uuid4())
     print(f"[{job_id}] Starting anonymous scan")
     
+    # Check the size (413 past UPLOAD_MAX_BYTES) and hash the spooled body in chunks
+    upload = await spool_upload(file)
     try:
-        file_bytes = await file.read()
         mime_type = file.content_type or "application/octet-stream"
         file_ext = file.filename.split('.')[-1].lower() if file.filename and '.' in file.filename else "jpg"
         
@@ -163,21 +201,24 @@ async def scan_anonymous(file: UploadFile = File(...)):
         # We upload to have a record and URL
         file_path = f"anonymous/{job_id}/raw.{file_ext}"
         storage_service = get_storage_service()
-        raw_url = storage_service.upload_file(
-            settings.BUCKET_RAW, 
-            file_path, 
-            file_bytes, 
-            mime_type
-        )
+        with upload.open() as stream:
+            raw_url = await storage_service.upload_file_async(
+                settings.BUCKET_RAW, 
+                file_path, 
+                stream, 
+                mime_type
+            )
         
         # Create initial DB entry with status 'processing'
-        jobs_service.create_job(job_id, raw_url, user_id=None)
+        await get_jobs_service().create_job_async(job_id, raw_url, user_id=None)
         
-        # 1. OCR
-        text = ocr_service.extract_text(file_bytes, mime_type=mime_type)
+        # 1. OCR (cached in memory only: anonymous scans never reach the disk cache)
+        text = await get_ocr_service().extract_text_async(
+            upload.read_bytes(), mime_type=mime_type, content_hash=upload.md5, persist_cache=False
+        )
         
         # 2. Parse
-        receipt_data = get_llm_parser_service().parse_receipt_with_llm(text)
+        receipt_data, _ = await get_receipt_parser_service().parse_async(text)
         
         # Ensure amount is float
         if receipt_data.amount is not None:
@@ -187,8 +228,11 @@ async def scan_anonymous(file: UploadFile = File(...)):
         receipt_dict = receipt_data.model_dump()
         
         # For anonymous scan, we might not generate exports yet, or we can if needed.
-        # Passing None for exports.
-        jobs_service.mark_job_ready(job_id, excel_url=None, pdf_url=None, receipt_data=receipt_dict, ocr_text=text)
+        # Passing None for exports. OCR text goes to the side table when it can.
+        stored = await get_artifacts_service().save_async(job_id, ocr_text=text)
+        get_jobs_service().mark_job_ready(
+            job_id, excel_url=None, pdf_url=None, receipt_data=receipt_dict, ocr_text=None if stored else text
+        )
         
         # Return result including receipt_id
         result = receipt_dict.copy()
@@ -201,18 +245,30 @@ async def scan_anonymous(file: UploadFile = File(...)):
         traceback.print_exc()
         # Update DB to error
         try:
-            jobs_service.mark_job_error(job_id, str(e))
+            get_jobs_service().mark_job_error(job_id, str(e))
         except Exception as db_err:
             print(f"[{job_id}] Failed to update error status: {db_err}")
             
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        upload.close()
+
+async def dispatch_job(request: ProcessRequest, background_tasks: BackgroundTasks):
+    """
+    Hands a job to the durable queue (processed by `python -m app.worker`)
+    or, by default, runs it in this web process after the response.
+    """
+    if settings.JOB_DISPATCH == "queue":
+        await asyncio.to_thread(get_job_queue().enqueue, request)
+    else:
+        background_tasks.add_task(process_receipt_job_v2, request)
 
 @router.post("/process")
 async def process_receipt(
     request: ProcessRequest,
     background_tasks: BackgroundTasks
 ):
-    background_tasks.add_task(process_receipt_job_v2, request)
+    await dispatch_job(request, background_tasks)
     return {"status": "processing_started", "receipt_id": request.receipt_id}
 
 async def process_receipt_job(job_id: str, file_bytes: bytes, file_ext: str, mime_type: str, email: Optional[str] = None):
@@ -231,23 +287,24 @@ async def upload_receipt(
     if not file:
         raise HTTPException(status_code=400, detail="No file uploaded")
 
+    upload = await spool_upload(file)
     try:
-        file_bytes = await file.read()
         file_ext = file.filename.split('.')[-1].lower() if '.' in file.filename else "jpg"
         
         job_id = str(uuid.uuid4())
         file_path = f"{job_id}/raw.{file_ext}"
         
-        # 1. Upload raw file
-        raw_url = storage_service.upload_file(
-            settings.BUCKET_RAW, 
-            file_path, 
-            file_bytes, 
-            file.content_type or "application/octet-stream"
-        )
+        # 1. Upload raw file (streamed from the request's spool, never fully in memory)
+        with upload.open() as stream:
+            raw_url = await storage_service.upload_file_async(
+                settings.BUCKET_RAW, 
+                file_path, 
+                stream, 
+                file.content_type or "application/octet-stream"
+            )
         
         # 2. Create Job
-        jobs_service.create_job(job_id, raw_url, user_id=user_id)
+        await get_jobs_service().create_job_async(job_id, raw_url, user_id=user_id)
         
         # 3. Trigger Processing in Background
         # We can adapt this to use v2 logic if we want, but for now let's leave it as legacy
@@ -260,10 +317,178 @@ async def upload_receipt(
             user_id=user_id or "anonymous",
             email=email
         )
-        background_tasks.add_task(process_receipt_job_v2, request)
+        await dispatch_job(request, background_tasks)
         
         return {"job_id": job_id, "status": "processing", "message": "Upload successful, processing started"}
         
     except Exception as e:
         print(f"Upload error: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    finally:
+        upload.close()
+
+BULK_ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "webp", "pdf"}
+
+def _is_zip(file: UploadFile) -> bool:
+    return (file.content_type in ("application/zip", "application/x-zip-compressed")
+            or (file.filename or "").lower().endswith(".zip"))
+
+def _iter_zip_entries(zip_file: zipfile.ZipFile):
+    """
+    Yields (name, read) for each receipt in the archive. Entries are read
+    lazily, one at a time, and capped at UPLOAD_MAX_BYTES whatever their
+    header claims (zip bombs).
+    """
+    for info in zip_file.infolist():
+        name = info.filename
+        base = name.rsplit("/", 1)[-1]
+        if info.is_dir() or name.startswith("__MACOSX/") or base.startswith("."):
+            continue
+
+        def read(info=info):
+            with zip_file.open(info) as entry:
+                data = entry.read(settings.UPLOAD_MAX_BYTES + 1)
+            if len(data) > settings.UPLOAD_MAX_BYTES:
+                raise ValueError("File too large")
+            return data
+
+        yield base, read
+
+async def process_batch(requests: list[ProcessRequest]):
+    """Runs a batch in the web process, BULK_PROCESS_CONCURRENCY jobs at a time."""
+    semaphore = asyncio.Semaphore(settings.BULK_PROCESS_CONCURRENCY)
+
+    async def run(request: ProcessRequest):
+        async with semaphore:
+            await process_receipt_job_v2(request)
+
+    await asyncio.gather(*(run(request) for request in requests))
+
+@router.post("/upload/bulk")
+async def upload_bulk(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    user_id: Optional[str] = Form(None),
+    email: Optional[str] = Form(None)
+):
+    """
+    Uploads many receipts at once, as individual files and/or ZIP archives.
+    Raw files are stored concurrently, all receipts rows are created with a
+    single insert and processing is queued with bounded parallelism.
+    Progress: GET /batches/{batch_id}.
+    """
+    batch_id = str(uuid.uuid4())
+    storage_service = get_storage_service()
+    # Also bounds how many archive entries are held in memory at once
+    semaphore = asyncio.Semaphore(settings.BULK_UPLOAD_CONCURRENCY)
+    tasks = []
+    skipped = []
+    spools = []
+    archives = []
+
+    async def store(filename: str, read):
+        try:
+            file_ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ""
+            if file_ext not in BULK_ALLOWED_EXTENSIONS:
+                skipped.append({"filename": filename, "error": "Unsupported file type"})
+                return None
+            content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            job_id = str(uuid.uuid4())
+            file_path = f"{job_id}/raw.{file_ext}"
+
+            data = await asyncio.to_thread(read)
+            try:
+                raw_url = await storage_service.upload_file_async(
+                    settings.BUCKET_RAW, file_path, data, content_type
+                )
+            finally:
+                if hasattr(data, "close"):
+                    data.close()
+            return {
+                "id": job_id,
+                "file_path": raw_url,
+                "user_id": user_id,
+                "batch_id": batch_id,
+                "original_filename": filename,
+                "file_type": content_type,
+                "_storage_path": file_path
+            }
+        except Exception as e:
+            print(f"[batch {batch_id}] Failed to store {filename}: {e}")
+            skipped.append({"filename": filename, "error": str(e)})
+            return None
+        finally:
+            semaphore.release()
+
+    async def schedule(filename: str, read):
+        if len(tasks) >= settings.BULK_UPLOAD_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"Too many files. Maximum is {settings.BULK_UPLOAD_MAX_FILES}.")
+        await semaphore.acquire()
+        tasks.append(asyncio.create_task(store(filename, read)))
+
+    try:
+        for file in files:
+            if _is_zip(file):
+                archive = await spool_upload(file, max_bytes=settings.BULK_UPLOAD_MAX_BYTES)
+                spools.append(archive)
+                stream = archive.open()
+                archives.append(stream)
+                try:
+                    zip_file = zipfile.ZipFile(stream)
+                except zipfile.BadZipFile:
+                    skipped.append({"filename": file.filename, "error": "Invalid ZIP archive"})
+                    continue
+                for filename, read in _iter_zip_entries(zip_file):
+                    await schedule(filename, read)
+            else:
+                upload = await spool_upload(file)
+                spools.append(upload)
+
+                def read(upload=upload):
+                    # Large files are streamed to storage from disk
+                    return upload.open() if upload.on_disk else upload.read_bytes()
+
+                await schedule(file.filename or "upload", read)
+
+        rows = [row for row in await asyncio.gather(*tasks) if row]
+    finally:
+        for task in tasks:
+            task.cancel()
+        for stream in archives:
+            stream.close()
+        for spool in spools:
+            spool.close()
+
+    if not rows:
+        raise HTTPException(status_code=400, detail={"message": "No valid receipt in upload", "skipped": skipped})
+
+    storage_paths = {row["id"]: row.pop("_storage_path") for row in rows}
+    try:
+        # One insert for the whole batch
+        await get_jobs_service().create_jobs_async(rows)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create receipts: {str(e)}")
+
+    requests = [
+        ProcessRequest(
+            receipt_id=row["id"],
+            file_path=storage_paths[row["id"]],
+            file_type=row["file_type"],
+            user_id=user_id or "anonymous",
+            email=email,
+            llm_batch=settings.LLM_BATCH_ENABLED
+        )
+        for row in rows
+    ]
+    if settings.JOB_DISPATCH == "queue":
+        await asyncio.to_thread(get_job_queue().enqueue_many, requests)
+    else:
+        background_tasks.add_task(process_batch, requests)
+
+    return {
+        "batch_id": batch_id,
+        "status": "processing",
+        "count": len(rows),
+        "receipt_ids": [row["id"] for row in rows],
+        "skipped": skipped
+    }
@@ -0,0 +1,82 @@
+import base64
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Optional
+from app.services.registry import get_supabase, get_jobs_service
+
+ENCODING = "zlib+base64"
+
+# Where rows written before receipt_artifacts kept the same data
+LEGACY_COLUMNS = "ocr_text:raw_json->ocr_text,ocr_text_raw:raw_json->ocr_text_raw,debug:raw_json->_debug"
+
+def compress_payload(payload: dict) -> tuple[str, int]:
+    """JSON -> zlib -> base64 text. Returns (encoded, raw size in bytes)."""
+    raw = json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+    return base64.b64encode(zlib.compress(raw, 6)).decode("ascii"), len(raw)
+
+def decompress_payload(encoded: str) -> dict:
+    return json.loads(zlib.decompress(base64.b64decode(encoded)).decode("utf-8"))
+
+class ReceiptArtifactsService:
+    """
+    Large per-receipt blobs (OCR text, processing trace) kept out of the
+    hot receipts row, compressed in the receipt_artifacts side table and
+    only read when someone asks for them.
+    """
+
+    def __init__(self):
+        self.db = get_supabase()
+        self.table = "receipt_artifacts"
+
+    async def save_async(self, receipt_id: str, ocr_text: Optional[str] = None, debug: Optional[dict] = None) -> bool:
+        """
+        Upserts the receipt's artifacts. Returns False when they could not
+        be stored (e.g. side table not migrated yet) so the caller can keep
+        them inline instead of losing them.
+        """
+        payload, raw_size = compress_payload({"ocr_text": ocr_text, "debug": debug})
+        row = {
+            "receipt_id": receipt_id,
+            "encoding": ENCODING,
+            "payload": payload,
+            "raw_size": raw_size,
+            "stored_size": len(payload),
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+        try:
+            await self.db.execute(lambda c: c.table(self.table).upsert(row, on_conflict="receipt_id"))
+            return True
+        except Exception as e:
+            print(f"[{receipt_id}] Failed to store artifacts: {e}")
+            return False
+
+    async def load_async(self, receipt_id: str) -> Optional[dict]:
+        """
+        {"ocr_text", "debug", "raw_size", "stored_size"} or None. Receipts
+        processed before the side table existed still have the text inline
+        in raw_json and are read from there.
+        """
+        response = await self.db.execute(
+            lambda c: c.table(self.table)
+            .select("encoding,payload,raw_size,stored_size")
+            .eq("receipt_id", receipt_id)
+        )
+        if response.data:
+            row = response.data[0]
+            if row["encoding"] != ENCODING:
+                raise ValueError(f"Unknown artifact encoding: {row['encoding']}")
+            artifacts = decompress_payload(row["payload"])
+            artifacts["raw_size"] = row["raw_size"]
+            artifacts["stored_size"] = row["stored_size"]
+            return artifacts
+
+        legacy = await get_jobs_service().get_job_async(receipt_id, columns=LEGACY_COLUMNS)
+        if not legacy or not (legacy.get("ocr_text") or legacy.get("ocr_text_raw") or legacy.get("debug")):
+            return None
+        return {
+            "ocr_text": legacy.get("ocr_text") or legacy.get("ocr_text_raw"),
+            "debug": legacy.get("debug"),
+            "raw_size": None,
+            "stored_size": None
+        }
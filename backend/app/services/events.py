@@ -0,0 +1,229 @@
+"""
+Job progress events, pushed to clients instead of status polling.
+
+The pipeline publishes each stage transition (see make_event_logger in
+routers/upload.py) on the EventBus, keyed by receipt id; the SSE endpoint
+(`GET /status/{job_id}/events`) subscribes to its job and streams them as
+they happen. The bus keeps the last events of each job for a while, so a
+client that connects after the upload returned still sees the stages it
+missed.
+
+Delivery inside the process is direct. Jobs that run elsewhere (queue
+workers, the LLM batch runner) reach the web process through an
+EventBackend: EVENTS_BACKEND="supabase" relays every event over a Supabase
+Realtime broadcast channel; "local" (the default) is enough when jobs run
+as background tasks of the web process.
+"""
+import asyncio
+import threading
+from datetime import datetime
+from typing import Callable, Optional
+from app.utils.cache import LRUCache
+
+# Job statuses after which no more events come
+FINAL_STATUSES = ("success", "failed")
+
+def job_event(stage: str, status: str = "processing", **fields) -> dict:
+    """A progress event: stage, timestamp, job status after it, plus `fields`."""
+    return {"stage": stage, "timestamp": datetime.utcnow().isoformat(), "status": status, **fields}
+
+class Subscription:
+    """Events of one topic for one listener, consumed on the listener's event loop."""
+
+    def __init__(self, bus: "EventBus", topic: str, max_queued: int = 100):
+        self.bus = bus
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queued)
+
+    def put(self, event: dict):
+        """Thread-safe: publishers may run on another thread or loop."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._put(event)
+        else:
+            try:
+                self.loop.call_soon_threadsafe(self._put, event)
+            except RuntimeError:
+                # Listener's loop is closed
+                pass
+
+    def _put(self, event: dict):
+        if self.queue.full():
+            # Slow client: the newest stage matters more than the oldest
+            self.queue.get_nowait()
+            self.bus.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+class EventBackend:
+    """Carries events between processes; `deliver(topic, event)` hands received ones to the bus."""
+
+    def bind(self, deliver: Callable[[str, dict], None]):
+        self.deliver = deliver
+
+    async def start(self):
+        """Starts receiving events from other processes."""
+
+    def publish(self, topic: str, event: dict):
+        """Sends an event to the other processes (not back to this one)."""
+
+    async def close(self):
+        pass
+
+class LocalEventBackend(EventBackend):
+    """Single process: nothing to relay."""
+
+class SupabaseBroadcastBackend(EventBackend):
+    """
+    Relays events over one private Supabase Realtime broadcast channel.
+    Private channels are only joinable with the service key (or through
+    RLS policies on realtime.messages), so browsers can't listen in.
+    """
+
+    EVENT = "job_progress"
+
+    def __init__(self, db, channel_name: str):
+        self.db = db
+        self.channel_name = channel_name
+        self._channel = None
+        self._loop = None
+        self._lock = None
+        # In-flight sends: the loop only keeps weak references to its tasks
+        self._pending = set()
+
+    async def _get_channel(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._channel = None
+        async with self._lock:
+            if self._channel is None:
+                client = await self.db.get_async_client()
+                channel = client.channel(self.channel_name, {
+                    "config": {"broadcast": {"self": False, "ack": False}, "private": True}
+                })
+                channel.on_broadcast(self.EVENT, self._on_broadcast)
+                await channel.subscribe()
+                self._channel = channel
+        return self._channel
+
+    def _on_broadcast(self, message: dict):
+        payload = message.get("payload") or {}
+        if payload.get("topic") and isinstance(payload.get("event"), dict):
+            self.deliver(payload["topic"], payload["event"])
+
+    async def start(self):
+        await self._get_channel()
+
+    async def _send(self, topic: str, event: dict):
+        try:
+            channel = await self._get_channel()
+            await channel.send_broadcast(self.EVENT, {"topic": topic, "event": event})
+        except Exception as e:
+            print(f"[events] Broadcast failed for {topic}: {e}")
+
+    def publish(self, topic: str, event: dict):
+        try:
+            pending = asyncio.get_running_loop().create_task(self._send(topic, event))
+        except RuntimeError:
+            # Called from a thread: hand it to the loop the channel lives on
+            if self._loop is None or self._loop.is_closed():
+                return
+            pending = asyncio.run_coroutine_threadsafe(self._send(topic, event), self._loop)
+        self._pending.add(pending)
+        pending.add_done_callback(self._pending.discard)
+
+    async def close(self):
+        if self._channel is not None:
+            try:
+                await self._channel.unsubscribe()
+            except Exception as e:
+                print(f"[events] Channel close failed: {e}")
+            self._channel = None
+
+class EventBus:
+    """In-process pub/sub of job progress events, one topic per receipt id."""
+
+    def __init__(self, backend: Optional[EventBackend] = None, replay_events: int = 20,
+                 replay_ttl: float = 600, max_topics: int = 1000):
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, set[Subscription]] = {}
+        # topic -> its latest events, replayed to new subscribers
+        self._recent = LRUCache(max_entries=max_topics, ttl=replay_ttl)
+        self.replay_events = replay_events
+        self.backend = backend or LocalEventBackend()
+        self.backend.bind(self.deliver)
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+
+    def publish(self, topic: str, event: dict):
+        """Delivers to this process's subscribers and relays to the other processes."""
+        self.published += 1
+        self._deliver(topic, event)
+        try:
+            self.backend.publish(topic, event)
+        except Exception as e:
+            print(f"[events] Relay failed for {topic}: {e}")
+
+    def deliver(self, topic: str, event: dict):
+        """Entry point of events coming from another process."""
+        self.received += 1
+        self._deliver(topic, event)
+
+    def _deliver(self, topic: str, event: dict):
+        with self._lock:
+            recent = self._recent.get(topic) or []
+            self._recent.set(topic, (recent + [event])[-self.replay_events:])
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def subscribe(self, topic: str) -> Subscription:
+        """Listens to `topic`; its recent events are queued first. Close it when done."""
+        subscription = Subscription(self, topic)
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+            recent = self._recent.get(topic) or []
+        for event in recent:
+            subscription.put(event)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.topic]
+
+    async def start(self):
+        try:
+            await self.backend.start()
+        except Exception as e:
+            # Jobs of this process still stream; other processes' don't until it reconnects
+            print(f"[events] Backend start failed: {e}")
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            listeners = sum(len(subscribers) for subscribers in self._subscribers.values())
+        return {
+            "backend": type(self.backend).__name__,
+            "listeners": listeners,
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped,
+        }
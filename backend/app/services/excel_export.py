@@ -1,20 +1,36 @@
-import pandas as pd
 from app.models.receipt import ReceiptData
+from typing import Iterable
 import io
 import os
 
+# pandas and openpyxl are imported on first export, not when the API starts
+# Columns of the multi-receipt export: (header, width)
+SUMMARY_COLUMNS = [
+    ("Receipt ID", 38), ("Date", 12), ("Merchant", 32), ("Amount", 12),
+    ("VAT", 10), ("Currency", 10), ("Category", 14), ("Status", 12), ("Created At", 28)
+]
+ITEM_COLUMNS = [("Receipt ID", 38), ("Date", 12), ("Merchant", 32), ("Description", 48), ("Amount", 12), ("VAT", 10)]
+
+# Receipt fields read by write_receipts: line items and VAT only live in raw_json
+EXPORT_COLUMNS = (
+    "id,created_at,status,merchant,date,amount,currency,category,"
+    "vat_amount:raw_json->vat_amount,items:raw_json->items"
+)
+
 class ExcelExportService:
     def generate_excel(self, receipt: ReceiptData) -> bytes:
         """
         Generates an Excel file from ReceiptData and returns the bytes.
         """
+        import pandas as pd
+
         # Prepare data for DataFrame
         data = {
             "Date": [receipt.date],
             "Merchant": [receipt.merchant],
             "Amount": [receipt.amount],
             "VAT": [receipt.vat_amount],
-            "Category": [receipt.category],
+            "Category": [getattr(receipt.category, "value", receipt.category)],
             "Currency": [receipt.currency]
         }
         
@@ -52,4 +68,41 @@ class ExcelExportService:
                 
         return output.getvalue()
 
-excel_export_service = ExcelExportService()
+    def write_receipts(self, receipts: Iterable[dict], path: str) -> int:
+        """
+        Writes many receipts rows (see EXPORT_COLUMNS) to an .xlsx file with a
+        Receipts sheet and a Line Items sheet. Uses openpyxl's write-only mode:
+        rows are streamed to disk as they come, so memory stays flat whatever
+        the number of receipts. Returns the number of receipts written.
+        """
+        from openpyxl import Workbook
+        from openpyxl.utils import get_column_letter
+
+        wb = Workbook(write_only=True)
+        summary = wb.create_sheet("Receipts")
+        items_sheet = wb.create_sheet("Line Items")
+        # Write-only sheets can't be auto-sized afterwards: fixed widths
+        for sheet, columns in ((summary, SUMMARY_COLUMNS), (items_sheet, ITEM_COLUMNS)):
+            for index, (header, width) in enumerate(columns, start=1):
+                sheet.column_dimensions[get_column_letter(index)].width = width
+            sheet.append([header for header, _ in columns])
+
+        count = 0
+        for row in receipts:
+            receipt_id = row.get("id")
+            date = row.get("date")
+            merchant = row.get("merchant")
+            summary.append([
+                receipt_id, date, merchant, row.get("amount"), row.get("vat_amount"),
+                row.get("currency"), row.get("category"), row.get("status"), row.get("created_at")
+            ])
+            for item in row.get("items") or []:
+                if isinstance(item, dict):
+                    items_sheet.append([
+                        receipt_id, date, merchant,
+                        item.get("description"), item.get("amount"), item.get("vat")
+                    ])
+            count += 1
+
+        wb.save(path)
+        return count
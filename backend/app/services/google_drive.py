@@ -2,15 +2,12 @@ import io
 import base64
 import os
 from datetime import datetime, timezone
-from supabase import create_client, Client
 from app.config import settings
+from app.services.registry import get_supabase_client
 
 # Allow OAuth scope to change (e.g. adding openid/email/profile)
 os.environ['OAUTHLIB_RELAX_TOKEN_SCOPE'] = '1'
 
-# Initialize Supabase client
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-
 def is_drive_enabled() -> bool:
     """Checks if Google Drive dependencies and configuration are available."""
     try:
@@ -65,7 +62,7 @@ class GoogleDriveService:
             from google.oauth2.credentials import Credentials
             from google.auth.transport.requests import Request
             
-            response = supabase.table("google_drive_tokens").select("*").eq("user_id", self.user_id).single().execute()
+            response = get_supabase_client().table("google_drive_tokens").select("*").eq("user_id", self.user_id).single().execute()
             if not response.data:
                 return None
 
@@ -84,7 +81,7 @@ class GoogleDriveService:
             if creds.expired:
                 creds.refresh(Request())
                 # Update Supabase
-                supabase.table("google_drive_tokens").update({
+                get_supabase_client().table("google_drive_tokens").update({
                     "access_token": creds.token,
                     # creds.expiry might be None if not returned by refresh, but usually is.
                     # If None, we don't update expires_at or calculate it.
@@ -0,0 +1,193 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pydantic import BaseModel
+from app.models.receipt import ProcessRequest
+
+class QueuedJob(BaseModel):
+    id: str
+    receipt_id: str
+    attempts: int = 0
+    request: ProcessRequest
+
+class SupabaseJobQueue:
+    """
+    Durable job queue backed by the jobs_processing table.
+
+    Workers claim jobs through the claim_receipt_jobs RPC, which takes a
+    lease with FOR UPDATE SKIP LOCKED, so any number of worker processes can
+    poll the same table. A job whose lease expires (crashed worker) is
+    claimed again by the next poll.
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            from app.services.registry import get_supabase_client
+            client = get_supabase_client()
+        self.supabase = client
+        self.table = "jobs_processing"
+
+    def enqueue(self, request: ProcessRequest):
+        data = {
+            "status": "queued",
+            "payload": request.model_dump(),
+            "available_at": datetime.now(timezone.utc).isoformat()
+        }
+        # The Next.js upload route may already have created the row
+        response = self.supabase.table(self.table).update(data).eq("receipt_id", request.receipt_id).execute()
+        if not response.data:
+            data["receipt_id"] = request.receipt_id
+            self.supabase.table(self.table).insert(data).execute()
+
+    def enqueue_many(self, requests: list[ProcessRequest]):
+        """Queues new receipts (no existing jobs_processing row) in one insert."""
+        if not requests:
+            return
+        available_at = datetime.now(timezone.utc).isoformat()
+        self.supabase.table(self.table).insert([
+            {
+                "receipt_id": request.receipt_id,
+                "status": "queued",
+                "payload": request.model_dump(),
+                "available_at": available_at
+            }
+            for request in requests
+        ]).execute()
+
+    def claim(self, worker_id: str, limit: int, lease_seconds: int) -> list[QueuedJob]:
+        response = self.supabase.rpc("claim_receipt_jobs", {
+            "p_worker_id": worker_id,
+            "p_limit": limit,
+            "p_lease_seconds": lease_seconds
+        }).execute()
+        return [
+            QueuedJob(
+                id=row["id"],
+                receipt_id=row["receipt_id"],
+                attempts=row.get("attempts") or 0,
+                request=ProcessRequest(**row["payload"])
+            )
+            for row in (response.data or [])
+        ]
+
+    def extend_lease(self, job: QueuedJob, worker_id: str, lease_seconds: int):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)
+        self.supabase.table(self.table).update({
+            "lease_expires_at": expires_at.isoformat()
+        }).eq("id", job.id).eq("locked_by", worker_id).execute()
+
+    def complete(self, job: QueuedJob):
+        # Identical for every job, so the state writer batches these across jobs
+        from app.services.registry import get_jobs_service
+        get_jobs_service().writer.submit(self.table, "id", job.id, {
+            "status": "completed",
+            "locked_by": None,
+            "lease_expires_at": None,
+            "last_error": None
+        })
+
+    def _flush_job_state(self):
+        # The pipeline's buffered status writes ("processing") must land
+        # before retry/fail, or a late flush overwrites them
+        from app.services.registry import get_jobs_service
+        get_jobs_service().flush()
+
+    def retry(self, job: QueuedJob, error: str, delay_seconds: float):
+        self._flush_job_state()
+        available_at = datetime.now(timezone.utc) + timedelta(seconds=delay_seconds)
+        self.supabase.table(self.table).update({
+            "status": "queued",
+            "locked_by": None,
+            "lease_expires_at": None,
+            "last_error": error,
+            "available_at": available_at.isoformat()
+        }).eq("id", job.id).execute()
+
+    def fail(self, job: QueuedJob, error: str):
+        self._flush_job_state()
+        self.supabase.table(self.table).update({
+            "status": "failed",
+            "locked_by": None,
+            "lease_expires_at": None,
+            "last_error": error
+        }).eq("id", job.id).execute()
+
+class InMemoryJobQueue:
+    """
+    Process-local stand-in for SupabaseJobQueue with the same lease
+    semantics. Used for tests and single-process development.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs: dict[str, dict] = {}
+
+    def enqueue(self, request: ProcessRequest) -> str:
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self.jobs[job_id] = {
+                "id": job_id,
+                "receipt_id": request.receipt_id,
+                "status": "queued",
+                "attempts": 0,
+                "last_error": None,
+                "locked_by": None,
+                "lease_expires_at": None,
+                "available_at": time.monotonic(),
+                "created_at": time.monotonic(),
+                "payload": request.model_dump()
+            }
+        return job_id
+
+    def enqueue_many(self, requests: list[ProcessRequest]):
+        for request in requests:
+            self.enqueue(request)
+
+    def claim(self, worker_id: str, limit: int, lease_seconds: int) -> list[QueuedJob]:
+        now = time.monotonic()
+        claimed = []
+        with self._lock:
+            for job in sorted(self.jobs.values(), key=lambda j: j["created_at"]):
+                if len(claimed) >= limit:
+                    break
+                due = job["status"] == "queued" and job["available_at"] <= now
+                # No lease at all counts as expired
+                expired = job["status"] == "processing" and (job["lease_expires_at"] or 0) < now
+                if not (due or expired):
+                    continue
+                job["status"] = "processing"
+                job["attempts"] += 1
+                job["locked_by"] = worker_id
+                job["lease_expires_at"] = now + lease_seconds
+                claimed.append(QueuedJob(
+                    id=job["id"],
+                    receipt_id=job["receipt_id"],
+                    attempts=job["attempts"],
+                    request=ProcessRequest(**job["payload"])
+                ))
+        return claimed
+
+    def extend_lease(self, job: QueuedJob, worker_id: str, lease_seconds: int):
+        with self._lock:
+            record = self.jobs[job.id]
+            if record["locked_by"] == worker_id:
+                record["lease_expires_at"] = time.monotonic() + lease_seconds
+
+    def complete(self, job: QueuedJob):
+        self._update(job, status="completed", last_error=None)
+
+    def retry(self, job: QueuedJob, error: str, delay_seconds: float):
+        self._update(job, status="queued", last_error=error, available_at=time.monotonic() + delay_seconds)
+
+    def fail(self, job: QueuedJob, error: str):
+        self._update(job, status="failed", last_error=error)
+
+    def _update(self, job: QueuedJob, **fields):
+        with self._lock:
+            record = self.jobs[job.id]
+            record.update(fields, locked_by=None, lease_expires_at=None)
+
+def get_job_queue():
+    from app.services.registry import get_job_queue
+    return get_job_queue()
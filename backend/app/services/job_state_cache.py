@@ -0,0 +1,128 @@
+import threading
+from typing import Optional
+
+from app.utils.cache import LRUCache
+
+# Statuses a job row keeps once the pipeline is done with it
+FINAL_STATUSES = ("success", "failed")
+
+def parse_columns(columns: str) -> dict:
+    """
+    {key in the result row: (source column, JSON path)} of a PostgREST select
+    list, e.g. "id,vat:raw_json->vat_amount" -> {"id": ("id", ()), "vat": ("raw_json", ("vat_amount",))}.
+    """
+    parsed = {}
+    for item in columns.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        alias, _, expression = item.rpartition(":")
+        column, *path = [part.strip() for part in expression.split("->")]
+        parsed[alias.strip() or column] = (column, tuple(path))
+    return parsed
+
+def _follow(value, path: tuple):
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+class JobStateCache:
+    """
+    Receipt rows by id, kept in process for the read endpoints (/status,
+    /receipts/{id}, exports), updated by JobsService on every write.
+
+    Each entry is the union of what was read or written for a job, so one
+    entry serves any select list whose columns it already holds ("*" once
+    the full row was read). Fields written by this process win over rows
+    read back from the database, which may predate the buffered write.
+
+    Rows read from the database are only cached once final, or when this
+    process is writing the job: a job run by a queue worker is re-read
+    until it finishes. Other writers (the frontend's reprocess, Drive sync)
+    are only seen once the entry expires, so the TTL is kept short.
+
+    The cache is only coherent for rows this process writes. Readers that
+    must see another process's writes (exports, debugging) pass
+    use_cache=False to JobsService.get_job_async.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: Optional[float] = 30):
+        self._entries = LRUCache(max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, entry: dict, columns: str) -> Optional[dict]:
+        if columns == "*":
+            return dict(entry["row"]) if entry["complete"] else None
+        row = {}
+        for key, (column, path) in parse_columns(columns).items():
+            if column in entry["row"]:
+                row[key] = _follow(entry["row"][column], path)
+            elif path and key in entry["derived"]:
+                row[key] = entry["derived"][key]
+            else:
+                return None
+        return row
+
+    def get(self, job_id: str, columns: str = "*") -> Optional[dict]:
+        """The cached row restricted to `columns`, or None if any of them is unknown."""
+        with self._lock:
+            entry = self._entries.get(job_id)
+            row = self._lookup(entry, columns) if entry is not None else None
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return row
+
+    def store(self, job_id: str, columns: str, row: dict) -> dict:
+        """
+        Caches a row read from the database (see the class docstring for
+        when it is kept) and returns it with this process's writes applied.
+        """
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is None:
+                if row.get("status") not in FINAL_STATUSES:
+                    return row
+                entry = {"row": {}, "derived": {}, "written": set(), "complete": False}
+                self._entries.set(job_id, entry)
+            sources = parse_columns(columns) if columns != "*" else {key: (key, ()) for key in row}
+            for key, value in row.items():
+                column, path = sources.get(key, (key, ()))
+                if column in entry["written"]:
+                    continue
+                if path:
+                    # Read through a JSON path: used while the column itself is unknown
+                    entry["derived"][key] = value
+                else:
+                    entry["row"][key] = value
+            entry["complete"] = entry["complete"] or columns == "*"
+            return self._lookup(entry, columns) or row
+
+    def write(self, job_id: str, fields: dict):
+        """Applies a write of this process to the job's entry (creating it)."""
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is None:
+                entry = {"row": {"id": job_id}, "derived": {}, "written": set(), "complete": False}
+                self._entries.set(job_id, entry)
+            entry["row"].update(fields)
+            # JSON path keys are read from the column itself from now on
+            entry["written"].update(fields)
+
+    def invalidate(self, job_id: str):
+        self._entries.delete(job_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        entries = self._entries.stats()
+        return {
+            "entries": entries["entries"],
+            "max_entries": entries["max_entries"],
+            "evictions": entries["evictions"],
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
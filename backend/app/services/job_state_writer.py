@@ -0,0 +1,121 @@
+import atexit
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from app.services.schema_probe import SchemaCapabilities, is_missing_column_error
+
+class JobStateWriter:
+    """
+    Coalesces job state writes before sending them to Supabase.
+
+    Writes are buffered for a short window (JOB_STATE_FLUSH_INTERVAL) and
+    then flushed:
+    - successive writes to the same row are merged, so a job that goes
+      processing -> success inside one window costs a single UPDATE;
+    - identical writes to different rows (e.g. N jobs switching to
+      "processing") are sent as one UPDATE ... WHERE key IN (...).
+    """
+
+    def __init__(
+        self,
+        client,
+        flush_interval: float = 0.2,
+        on_write_error: Optional[Callable] = None,
+        schema: Optional[SchemaCapabilities] = None
+    ):
+        self.supabase = client
+        self.schema = schema or SchemaCapabilities(client)
+        self.flush_interval = flush_interval
+        self.on_write_error = on_write_error
+        self._pending: dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+        # Serializes flushes so batches reach the database in submission order
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.round_trips = 0
+        self.rows_written = 0
+
+    def submit(self, table: str, key_column: str, key: str, fields: dict):
+        with self._lock:
+            row_key = (table, key_column, key)
+            if row_key in self._pending:
+                self._pending[row_key].update(fields)
+            else:
+                self._pending[row_key] = dict(fields)
+            self._ensure_thread()
+        self._wakeup.set()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="job-state-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Leave the window open so concurrent jobs can join the batch
+            time.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Job state flush error: {e}")
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+
+            # Group rows receiving identical fields into one UPDATE
+            groups: dict[tuple, tuple[dict, list]] = {}
+            for (table, key_column, key), fields in pending.items():
+                signature = (table, key_column, json.dumps(fields, sort_keys=True, default=str))
+                if signature not in groups:
+                    groups[signature] = (fields, [])
+                groups[signature][1].append(key)
+
+            updated_at = datetime.utcnow().isoformat()
+            for (table, key_column, _), (fields, keys) in groups.items():
+                self._write(table, key_column, keys, {**fields, "updated_at": updated_at})
+
+    def _write(self, table: str, key_column: str, keys: list, fields: dict):
+        try:
+            self._execute(table, key_column, keys, self.schema.filter(table, fields))
+        except Exception as e:
+            if is_missing_column_error(e):
+                # The schema changed since it was probed: re-probe once and retry
+                self.schema.refresh(table)
+                try:
+                    self._execute(table, key_column, keys, self.schema.filter(table, fields))
+                    return
+                except Exception as e2:
+                    e = e2
+            print(f"Error writing {table} state for {keys}: {e}")
+            if self.on_write_error:
+                self.on_write_error(table, keys, fields, e)
+
+    def _execute(self, table: str, key_column: str, keys: list, fields: dict):
+        query = self.supabase.table(table).update(fields)
+        if len(keys) == 1:
+            query = query.eq(key_column, keys[0])
+        else:
+            query = query.in_(key_column, keys)
+        query.execute()
+        self.round_trips += 1
+        self.rows_written += len(keys)
+
+    def stats(self) -> dict:
+        return {
+            "round_trips": self.round_trips,
+            "rows_written": self.rows_written,
+            "pending": len(self._pending),
+        }
+
+    def register_atexit(self):
+        atexit.register(self.flush)
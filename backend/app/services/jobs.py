@@ -1,42 +1,85 @@
-from supabase import create_client, Client
 from app.config import settings
+from app.services.job_state_cache import JobStateCache
+from app.services.job_state_writer import JobStateWriter
+from app.services.schema_probe import SchemaCapabilities
 from datetime import datetime
 from typing import Optional
 
 class JobsService:
     def __init__(self):
-        self.supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+        from app.services.registry import get_supabase
+        # Shared pooled clients: self.supabase (sync) for threads, self.db for async routes
+        self.db = get_supabase()
+        self.supabase = self.db.client
         self.table = "receipts"
+        # Optional columns are probed once (then every SCHEMA_PROBE_TTL_SECONDS)
+        self.schema = SchemaCapabilities(self.supabase, ttl=settings.SCHEMA_PROBE_TTL_SECONDS)
+        self.writer = JobStateWriter(
+            self.supabase,
+            flush_interval=settings.JOB_STATE_FLUSH_INTERVAL,
+            on_write_error=self._on_write_error,
+            schema=self.schema
+        )
+        self.writer.register_atexit()
+        # Rows for the read endpoints, updated by the writes below
+        self.cache = JobStateCache(max_entries=settings.JOB_CACHE_MAX_ENTRIES, ttl=settings.JOB_CACHE_TTL_SECONDS)
 
-    def create_job(self, job_id: str, file_url: str, user_id: Optional[str] = None):
-        # This might not be used anymore if Next.js creates the row
-        data = {
+    def _new_job_row(self, job_id: str, file_url: str, user_id: Optional[str] = None) -> dict:
+        return {
             "id": job_id,
             "file_path": file_url,
             "status": "processing",
             "user_id": user_id,
             "created_at": datetime.utcnow().isoformat()
         }
+
+    def _new_job_rows(self, rows: list[dict]) -> list[dict]:
+        created_at = datetime.utcnow().isoformat()
+        return [{"status": "processing", "created_at": created_at, **row} for row in rows]
+
+    def create_job(self, job_id: str, file_url: str, user_id: Optional[str] = None):
+        # This might not be used anymore if Next.js creates the row
+        data = self._new_job_row(job_id, file_url, user_id)
         try:
             self.supabase.table(self.table).insert(data).execute()
         except Exception as e:
             print(f"Error creating job: {e}")
             raise e
 
-    def update_job_status(self, job_id: str, status: str):
+    async def create_job_async(self, job_id: str, file_url: str, user_id: Optional[str] = None):
+        data = self._new_job_row(job_id, file_url, user_id)
+        try:
+            await self.db.execute(lambda c: c.table(self.table).insert(data))
+        except Exception as e:
+            print(f"Error creating job: {e}")
+            raise e
+
+    def create_jobs(self, rows: list[dict]):
+        """
+        Inserts many receipts rows in a single request (bulk upload).
+        Each row needs id and file_path; status defaults to processing.
+        """
+        data = self._new_job_rows(rows)
+        try:
+            self.supabase.table(self.table).insert(data).execute()
+        except Exception as e:
+            print(f"Error creating {len(rows)} jobs: {e}")
+            raise e
+
+    async def create_jobs_async(self, rows: list[dict]):
+        data = self._new_job_rows(rows)
         try:
-            self.supabase.table(self.table).update({"status": status}).eq("id", job_id).execute()
-            # Also update jobs_processing if it exists
-            try:
-                self.supabase.table("jobs_processing").update({"status": status, "updated_at": datetime.utcnow().isoformat()}).eq("receipt_id", job_id).execute()
-            except Exception as e:
-                # Fallback if updated_at missing
-                if "updated_at" in str(e) or "PGRST204" in str(e) or "42703" in str(e):
-                     self.supabase.table("jobs_processing").update({"status": status}).eq("receipt_id", job_id).execute()
-                else:
-                    print(f"Error updating jobs_processing: {e}")
+            await self.db.execute(lambda c: c.table(self.table).insert(data))
         except Exception as e:
-            print(f"Error updating job status: {e}")
+            print(f"Error creating {len(rows)} jobs: {e}")
+            raise e
+
+    def update_job_status(self, job_id: str, status: str):
+        # Buffered: merged with the job's next transition and batched with other jobs
+        self.writer.submit(self.table, "id", job_id, {"status": status})
+        self.cache.write(job_id, {"status": status})
+        # Also update jobs_processing if it exists
+        self.writer.submit("jobs_processing", "receipt_id", job_id, {"status": status})
 
     def mark_job_ready(self, job_id: str, excel_url: str, pdf_url: str, receipt_data: dict = None, ocr_text: str = None):
         print(f"[{job_id}] Marking job ready. Data: {receipt_data}")
@@ -45,8 +88,7 @@ class JobsService:
         data = {
             "status": "success",
             "excel_url": excel_url,
-            "pdf_url": pdf_url,
-            "updated_at": datetime.utcnow().isoformat()
+            "pdf_url": pdf_url
         }
         
         if receipt_data:
@@ -76,84 +118,99 @@ class JobsService:
             
             print(f"[{job_id}] Updating receipts table with: amount={data.get('amount')}, merchant={data.get('merchant')}")
 
-        try:
-            # Update public.receipts
-            response = self.supabase.table(self.table).update(data).eq("id", job_id).execute()
-            print(f"[{job_id}] Receipts table updated. Rows affected: {len(response.data) if response.data else 0}")
-            
-            # Update public.jobs_processing
-            try:
-                self.supabase.table("jobs_processing").update({
-                    "status": "completed", 
-                    "updated_at": datetime.utcnow().isoformat()
-                }).eq("receipt_id", job_id).execute()
-                print(f"[{job_id}] Jobs processing table updated to completed.")
-            except Exception as e:
-                if "updated_at" in str(e) or "PGRST204" in str(e) or "42703" in str(e):
-                    self.supabase.table("jobs_processing").update({"status": "completed"}).eq("receipt_id", job_id).execute()
-                else:
-                    print(f"[{job_id}] Error updating jobs_processing: {e}")
-            
-        except Exception as e:
-            print(f"[{job_id}] Error marking job ready: {e}")
-            # Fallback: remove columns that might be missing
-            if "excel_url" in str(e) or "pdf_url" in str(e) or "updated_at" in str(e) or "PGRST204" in str(e) or "42703" in str(e):
-                print(f"[{job_id}] Retrying update without optional columns...")
-                data.pop("excel_url", None)
-                data.pop("pdf_url", None)
-                data.pop("updated_at", None)
-                try:
-                    self.supabase.table(self.table).update(data).eq("id", job_id).execute()
-                    print(f"[{job_id}] Retry successful.")
-                except Exception as e2:
-                    print(f"[{job_id}] Retry failed: {e2}")
-                    self.mark_job_error(job_id, f"Failed to save results: {str(e2)}")
-            else:
-                self.mark_job_error(job_id, f"Failed to save results: {str(e)}")
+        self.writer.submit(self.table, "id", job_id, data)
+        self.cache.write(job_id, data)
+        self.writer.submit("jobs_processing", "receipt_id", job_id, {"status": "completed"})
+
+    def record_export_url(self, job_id: str, column: str, url: str):
+        """Stores a generated export's URL (pdf_url / excel_url)."""
+        self.writer.submit(self.table, "id", job_id, {column: url})
+        self.cache.write(job_id, {column: url})
 
     def mark_job_error(self, job_id: str, error_message: str):
         print(f"[{job_id}] Marking job error: {error_message}")
         data = {
             "status": "failed",
-            "raw_json": {"error": error_message},
-            "updated_at": datetime.utcnow().isoformat()
+            "raw_json": {"error": error_message}
         }
-        try:
-            try:
-                self.supabase.table(self.table).update(data).eq("id", job_id).execute()
-            except Exception as e:
-                if "updated_at" in str(e) or "PGRST204" in str(e) or "42703" in str(e):
-                    data.pop("updated_at", None)
-                    self.supabase.table(self.table).update(data).eq("id", job_id).execute()
-                else:
-                    raise e
-            
-            # Update jobs_processing
-            try:
-                self.supabase.table("jobs_processing").update({
-                    "status": "failed", 
-                    "updated_at": datetime.utcnow().isoformat()
-                }).eq("receipt_id", job_id).execute()
-            except Exception as e:
-                 if "updated_at" in str(e) or "PGRST204" in str(e) or "42703" in str(e):
-                    self.supabase.table("jobs_processing").update({"status": "failed"}).eq("receipt_id", job_id).execute()
-                 else:
-                    print(f"[{job_id}] Error updating jobs_processing error status: {e}")
+        self.writer.submit(self.table, "id", job_id, data)
+        self.cache.write(job_id, data)
+        self.writer.submit("jobs_processing", "receipt_id", job_id, {"status": "failed"})
 
-        except Exception as e:
-            print(f"[{job_id}] Error marking job error: {e}")
+    def _on_write_error(self, table: str, keys: list, fields: dict, error: Exception):
+        if table == self.table:
+            # The cached rows hold what failed to reach the database
+            for job_id in keys:
+                self.cache.invalidate(job_id)
+        # Results that could not be saved must not leave the receipt "processing"
+        if table == self.table and fields.get("status") == "success":
+            for job_id in keys:
+                self.mark_job_error(job_id, f"Failed to save results: {str(error)}")
+
+    def flush(self):
+        """Writes any buffered job state immediately."""
+        self.writer.flush()
 
-    def get_all_jobs(self, limit: int = 50, user_id: Optional[str] = None):
-        query = self.supabase.table(self.table).select("*").order("created_at", desc=True).limit(limit)
+    def select_columns(self, columns) -> str:
+        """Select list of `columns` minus optional ones the schema lacks."""
+        missing = self.schema.missing_columns(self.table)
+        return ",".join(column for column in columns if column not in missing)
+
+    def _page_query(self, client, columns: str, limit: int, user_id: Optional[str] = None,
+                    status: Optional[str] = None, after: Optional[tuple] = None):
+        """
+        Newest-first page of receipts. `after` is the (created_at, id) of the
+        last row of the previous page: the keyset filter lets Postgres seek
+        straight to it on the (user_id, created_at, id) index instead of
+        scanning and discarding an offset.
+        """
+        query = client.table(self.table).select(columns)
         if user_id:
             query = query.eq("user_id", user_id)
+        if status:
+            query = query.eq("status", status)
+        if after:
+            created_at, last_id = after
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{last_id}")'
+            )
+        return query.order("created_at", desc=True).order("id", desc=True).limit(limit)
+
+    def get_all_jobs(self, limit: int = 50, user_id: Optional[str] = None, columns: str = "*", after: Optional[tuple] = None):
         try:
-            response = query.execute()
+            response = self._page_query(self.supabase, columns, limit, user_id=user_id, after=after).execute()
             return response.data
         except Exception as e:
             print(f"Error fetching all jobs: {e}")
             return []
 
+    async def get_all_jobs_async(self, limit: int = 50, user_id: Optional[str] = None, columns: str = "*", after: Optional[tuple] = None):
+        try:
+            response = await self.db.execute(
+                lambda c: self._page_query(c, columns, limit, user_id=user_id, after=after)
+            )
+            return response.data
+        except Exception as e:
+            print(f"Error fetching all jobs: {e}")
+            return []
+
+    def iter_jobs(self, user_id: Optional[str] = None, columns: str = "*", status: Optional[str] = None, page_size: int = 1000):
+        """
+        Yields receipts rows newest first, one page at a time.
+
+        Pages are keyset-paginated on (created_at, id) rather than offset,
+        so each page costs the same however deep the export goes. `columns`
+        must include created_at and id.
+        """
+        cursor = None
+        while True:
+            query = self._page_query(self.supabase, columns, page_size, user_id=user_id, status=status, after=cursor)
+            rows = query.execute().data or []
+            yield from rows
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
     def get_job(self, job_id: str):
         try:
             response = self.supabase.table(self.table).select("*").eq("id", job_id).execute()
@@ -164,4 +221,52 @@ class JobsService:
             print(f"Error fetching job: {e}")
             return None
 
-jobs_service = JobsService()
+    async def get_job_async(self, job_id: str, columns: str = "*", use_cache: bool = True):
+        """The receipt row (its `columns`), from the job state cache when it holds them."""
+        if use_cache:
+            cached = self.cache.get(job_id, columns)
+            if cached is not None:
+                return cached
+        try:
+            response = await self.db.execute(lambda c: c.table(self.table).select(columns).eq("id", job_id))
+            if response.data:
+                # With this process's not yet flushed writes applied
+                return self.cache.store(job_id, columns, response.data[0])
+            return None
+        except Exception as e:
+            print(f"Error fetching job: {e}")
+            return None
+
+    def get_batch_status(self, batch_id: str) -> Optional[dict]:
+        try:
+            response = self.supabase.table(self.table).select("id,status").eq("batch_id", batch_id).execute()
+        except Exception as e:
+            print(f"Error fetching batch: {e}")
+            return None
+        return self._summarize_batch(batch_id, response.data)
+
+    async def get_batch_status_async(self, batch_id: str) -> Optional[dict]:
+        try:
+            response = await self.db.execute(
+                lambda c: c.table(self.table).select("id,status").eq("batch_id", batch_id)
+            )
+        except Exception as e:
+            print(f"Error fetching batch: {e}")
+            return None
+        return self._summarize_batch(batch_id, response.data)
+
+    def _summarize_batch(self, batch_id: str, rows: list) -> Optional[dict]:
+        if not rows:
+            return None
+
+        counts = {}
+        for row in rows:
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+        done = counts.get("success", 0) + counts.get("failed", 0)
+        return {
+            "batch_id": batch_id,
+            "total": len(rows),
+            "done": done,
+            "counts": counts,
+            "receipts": rows
+        }
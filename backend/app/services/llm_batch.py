@@ -0,0 +1,228 @@
+"""
+Offline LLM parsing through the OpenAI Batch API.
+
+Bulk jobs don't need an answer within seconds. Instead of one
+interactive chat completion per receipt, receipts that the heuristic
+parser could not settle are parked in llm_batch_items. The batch runner
+(`python -m app.worker --llm-batches`) packs them into one Batch API JSONL
+file (custom_id = receipt id), polls it, and then finishes each receipt
+with the result. Batch requests cost half as much and don't count against
+the interactive rate limits.
+
+The API calls go through an LLMBatchBackend, so a fake backend can be
+plugged in (LLMParserService.batch_backend), or OPENAI_BASE_URL can point
+the default one at a local fake server.
+"""
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Optional
+from app.config import settings
+from app.models.receipt import ProcessRequest
+from app.services.registry import (
+    get_supabase, get_llm_parser_service, get_artifacts_service, get_receipt_parser_service, get_jobs_service
+)
+
+# Batch states after which the results can be collected
+FINAL_BATCH_STATES = ("completed", "failed", "expired", "cancelled")
+
+class LLMBatchBackend(ABC):
+    """Submits JSONL batch requests and returns their results."""
+
+    @abstractmethod
+    def submit(self, lines: list[dict]) -> str:
+        """Sends the request lines as one batch and returns the batch id."""
+
+    @abstractmethod
+    def retrieve(self, batch_id: str) -> dict:
+        """{"id", "status", "output_file_id", "error_file_id"}"""
+
+    @abstractmethod
+    def fetch(self, batch: dict) -> list[dict]:
+        """Result lines ({"custom_id", "response", "error"}) of a finished batch."""
+
+class OpenAIBatchBackend(LLMBatchBackend):
+    def __init__(self, client, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, lines: list[dict]) -> str:
+        payload = "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+        input_file = self.client.files.create(file=("receipts.jsonl", payload), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window
+        )
+        return batch.id
+
+    def retrieve(self, batch_id: str) -> dict:
+        batch = self.client.batches.retrieve(batch_id)
+        return {
+            "id": batch.id,
+            "status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id,
+        }
+
+    def fetch(self, batch: dict) -> list[dict]:
+        lines = []
+        for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+            if file_id:
+                content = self.client.files.content(file_id).text
+                lines += [json.loads(line) for line in content.splitlines() if line.strip()]
+        return lines
+
+class LLMBatchService:
+    def __init__(self):
+        self.db = get_supabase()
+        self.table = "llm_batch_items"
+
+    def _now(self) -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    async def defer_async(self, request: ProcessRequest, ocr_text: str, debug: dict):
+        """Parks a receipt until the next batch; its OCR text waits in receipt_artifacts."""
+        if not await get_artifacts_service().save_async(request.receipt_id, ocr_text=ocr_text, debug=debug):
+            raise Exception("Cannot defer to the LLM batch: OCR text could not be stored")
+        await self.db.execute(lambda c: c.table(self.table).upsert({
+            "receipt_id": request.receipt_id,
+            "status": "pending",
+            "batch_id": None,
+            "request": request.model_dump(),
+            "error": None,
+            "updated_at": self._now()
+        }, on_conflict="receipt_id"))
+
+    async def _set_status(self, receipt_ids: list[str], **fields):
+        fields["updated_at"] = self._now()
+        await self.db.execute(lambda c: c.table(self.table).update(fields).in_("receipt_id", receipt_ids))
+
+    async def submit_pending(self, force: bool = False) -> Optional[str]:
+        """
+        Submits waiting receipts as one batch once there are
+        LLM_BATCH_MAX_REQUESTS of them, or the oldest has waited
+        LLM_BATCH_MAX_WAIT_SECONDS (or right away with force).
+        """
+        response = await self.db.execute(
+            lambda c: c.table(self.table)
+            .select("receipt_id,created_at")
+            .eq("status", "pending")
+            .order("created_at")
+            .limit(settings.LLM_BATCH_MAX_REQUESTS)
+        )
+        rows = response.data or []
+        if not rows:
+            return None
+        oldest = datetime.fromisoformat(rows[0]["created_at"])
+        waited = (datetime.now(timezone.utc) - oldest).total_seconds()
+        if not force and len(rows) < settings.LLM_BATCH_MAX_REQUESTS and waited < settings.LLM_BATCH_MAX_WAIT_SECONDS:
+            return None
+
+        artifacts = get_artifacts_service()
+        texts = {}
+        for row in rows:
+            loaded = await artifacts.load_async(row["receipt_id"])
+            if loaded and loaded.get("ocr_text"):
+                texts[row["receipt_id"]] = loaded["ocr_text"]
+        missing = [row["receipt_id"] for row in rows if row["receipt_id"] not in texts]
+        if missing:
+            await self._set_status(missing, status="error", error="OCR text not found")
+            for receipt_id in missing:
+                get_jobs_service().mark_job_error(receipt_id, "LLM batch: OCR text not found")
+        if not texts:
+            return None
+
+        batch_id = await asyncio.to_thread(get_llm_parser_service().submit_batch, texts)
+        await self._set_status(list(texts), status="submitted", batch_id=batch_id)
+        print(f"[llm batch] Submitted {batch_id} with {len(texts)} receipts")
+        return batch_id
+
+    async def poll_submitted(self) -> int:
+        """Collects every finished batch. Returns the number of batches still running."""
+        response = await self.db.execute(
+            lambda c: c.table(self.table).select("batch_id").eq("status", "submitted")
+        )
+        batch_ids = {row["batch_id"] for row in response.data or [] if row.get("batch_id")}
+        running = 0
+        for batch_id in batch_ids:
+            batch = await asyncio.to_thread(get_llm_parser_service().batch_status, batch_id)
+            if batch["status"] in FINAL_BATCH_STATES:
+                await self._collect(batch)
+            else:
+                running += 1
+        return running
+
+    async def _collect(self, batch: dict):
+        # Imported here: the pipeline lives with the upload routes
+        from app.routers.upload import finish_receipt_job, make_event_logger
+
+        response = await self.db.execute(
+            lambda c: c.table(self.table)
+            .select("receipt_id,request,attempts")
+            .eq("batch_id", batch["id"])
+            .eq("status", "submitted")
+        )
+        rows = response.data or []
+        artifacts_service = get_artifacts_service()
+        artifacts = {row["receipt_id"]: await artifacts_service.load_async(row["receipt_id"]) or {} for row in rows}
+        texts = {receipt_id: loaded.get("ocr_text") or "" for receipt_id, loaded in artifacts.items()}
+        results = await asyncio.to_thread(get_llm_parser_service().fetch_batch_results, batch, texts)
+        print(f"[llm batch] {batch['id']} {batch['status']}: {len(results)} results for {len(rows)} receipts")
+
+        for row in rows:
+            receipt_id = row["receipt_id"]
+            result = results.get(receipt_id)
+            if result is None:
+                # Never ran (batch expired or cancelled first): next batch
+                attempts = (row.get("attempts") or 0) + 1
+                if attempts < settings.LLM_BATCH_MAX_ATTEMPTS:
+                    await self._set_status([receipt_id], status="pending", batch_id=None, attempts=attempts)
+                    continue
+                result = Exception(f"No result after {attempts} batches")
+
+            request = ProcessRequest(**row["request"])
+            debug_info = artifacts[receipt_id].get("debug") or {
+                "trace_id": request.trace_id, "receipt_id": receipt_id, "logs": []
+            }
+            log_event = make_event_logger(debug_info)
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                log_event("LLM_BATCH", {"batch_id": batch["id"], "result": result.model_dump(mode="json")})
+                get_receipt_parser_service().record_llm_result(texts[receipt_id], result)
+                await finish_receipt_job(receipt_id, result, texts[receipt_id], debug_info, log_event)
+                await self._set_status([receipt_id], status="done")
+            except Exception as e:
+                log_event("ERROR", {"error": str(e), "batch_id": batch["id"]}, status="failed", error=str(e))
+                await artifacts_service.save_async(receipt_id, ocr_text=texts[receipt_id], debug=debug_info)
+                get_jobs_service().mark_job_error(receipt_id, str(e))
+                await self._set_status([receipt_id], status="error", error=str(e))
+
+    async def run(self, stopping: asyncio.Event, drain: bool = False):
+        """
+        Submits and collects batches every LLM_BATCH_POLL_INTERVAL seconds
+        until `stopping` is set. With drain=True, waiting receipts are
+        submitted right away and the loop returns once every batch is collected.
+        """
+        print("[llm batch] Runner started")
+        while not stopping.is_set():
+            running = 0
+            try:
+                await self.submit_pending(force=drain)
+                running = await self.poll_submitted()
+            except Exception as e:
+                print(f"[llm batch] Poll failed: {e}")
+            if drain and not running:
+                pending = await self.db.execute(
+                    lambda c: c.table(self.table).select("receipt_id").eq("status", "pending").limit(1)
+                )
+                if not pending.data:
+                    break
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=settings.LLM_BATCH_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        get_jobs_service().flush()
+        print("[llm batch] Runner stopped")
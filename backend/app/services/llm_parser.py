@@ -3,17 +3,54 @@ from typing import Optional, Literal
 from datetime import datetime
 import json
 import os
-from openai import OpenAI
+import re
+import hashlib
+import asyncio
+import threading
+import weakref
+import httpx
+from openai import OpenAI, AsyncOpenAI
 from app.config import settings
 from app.models.receipt import ReceiptData
 from app.utils.parsing import parse_amount, extract_amount_from_text
+from app.utils.cache import LRUCache
+from app.utils.text_compaction import compact_ocr_text, COMPACTION_VERSION
+
+# Bump whenever the prompt or post-processing changes so cached results are not reused
+PROMPT_VERSION = "2"
+
+# Error-file codes of Batch API requests that never ran (sent again in a later batch)
+UNRUN_BATCH_ERROR_CODES = ("batch_expired", "batch_cancelled")
+
+def normalize_ocr_text(text: str) -> str:
+    """
+    Canonical form of OCR text used for cache keys: trims lines,
+    collapses inner whitespace and drops blank lines.
+    """
+    lines = (re.sub(r"\s+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
 
 class LLMParserService:
     def __init__(self):
         self.client = None
+        # Event loop -> its async client and semaphore: the client's pool and
+        # the semaphore belong to the loop they were created on
+        self._async = weakref.WeakKeyDictionary()
+        self._async_lock = threading.Lock()
+        self.model = settings.OPENAI_MODEL
+        self.cache = LRUCache(
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            ttl=settings.LLM_CACHE_TTL_SECONDS
+        )
+        # Estimated OCR tokens sent vs. received, over all prompts
+        self._prompt_lock = threading.Lock()
+        self.prompts = 0
+        self.ocr_tokens_before = 0
+        self.ocr_tokens_after = 0
+        self._batch_backend = None
         try:
             if settings.OPENAI_API_KEY:
-                self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+                self.client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
             else:
                 print("Warning: OPENAI_API_KEY not set. LLM Parser will be unavailable.")
         except Exception as e:
@@ -22,10 +59,54 @@ class LLMParserService:
     def is_available(self) -> bool:
         return self.client is not None
 
-    def parse_receipt_with_llm(self, ocr_text: str) -> ReceiptData:
-        if not self.client:
-            raise Exception("OpenAI Client not initialized. Check OPENAI_API_KEY.")
+    def _cache_key(self, ocr_text: str) -> str:
+        # The prompt holds the compacted text: its settings change the result too
+        compaction = (
+            f"{COMPACTION_VERSION}:{settings.LLM_PROMPT_MAX_OCR_TOKENS}" if settings.LLM_COMPACT_OCR_TEXT else "off"
+        )
+        payload = f"{PROMPT_VERSION}|{compaction}|{self.model}|{normalize_ocr_text(ocr_text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
+    def _get_cached(self, cache_key: str) -> Optional[ReceiptData]:
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return None
+        print(f"LLM parse cache hit for {cache_key[:12]}")
+        # Callers mutate the result, never hand out the cached instance
+        return cached.model_copy(deep=True)
+
+    def _compact(self, ocr_text: str) -> str:
+        if not settings.LLM_COMPACT_OCR_TEXT:
+            return ocr_text
+        compacted, stats = compact_ocr_text(ocr_text, settings.LLM_PROMPT_MAX_OCR_TOKENS)
+        with self._prompt_lock:
+            self.prompts += 1
+            self.ocr_tokens_before += stats["tokens_before"]
+            self.ocr_tokens_after += stats["tokens_after"]
+        print(
+            f"OCR text compacted for prompt: ~{stats['tokens_before']} -> ~{stats['tokens_after']} tokens "
+            f"(saved ~{stats['tokens_saved']}, {stats['lines_before']} -> {stats['lines_after']} lines"
+            f"{', cut to budget' if stats['truncated'] else ''})"
+        )
+        return compacted
+
+    def _log_usage(self, response):
+        usage = getattr(response, "usage", None)
+        if usage:
+            print(f"LLM usage: {usage.prompt_tokens} prompt + {usage.completion_tokens} completion tokens")
+
+    def prompt_stats(self) -> dict:
+        with self._prompt_lock:
+            return {
+                "prompts": self.prompts,
+                "ocr_tokens_before": self.ocr_tokens_before,
+                "ocr_tokens_after": self.ocr_tokens_after,
+                "ocr_tokens_saved": self.ocr_tokens_before - self.ocr_tokens_after,
+                "saved_ratio": round(1 - self.ocr_tokens_after / self.ocr_tokens_before, 4) if self.ocr_tokens_before else 0.0,
+            }
+
+    def _completion_params(self, ocr_text: str) -> dict:
+        ocr_text = self._compact(ocr_text)
         prompt = f"""
         You are an expert data extraction assistant. 
         Your task is to extract structured data from the following OCR text of a receipt or invoice.
@@ -80,49 +161,177 @@ class LLMParserService:
         }}
         """
 
+        # To switch to Gemini or another provider, you would replace the
+        # completion call with the respective SDK call (e.g., google.generativeai)
+        return {
+            "model": self.model,  # "gpt-4o-mini" by default, "gpt-4o" for better results
+            "messages": [
+                {"role": "system", "content": "You are a helpful assistant that extracts data from receipts and returns JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.1,
+            "response_format": {"type": "json_object"}
+        }
+
+    def _to_receipt_data(self, content: str, ocr_text: str) -> ReceiptData:
+        data = json.loads(content)
+        
+        # --- ROBUSTNESS LAYER ---
+        # 1. Parse Amount
+        parsed_amount = parse_amount(data.get("amount"))
+        
+        # 2. Fallback if amount is missing or 0
+        if not parsed_amount:
+            print("LLM failed to extract amount. Trying regex fallback...")
+            fallback_amount = extract_amount_from_text(ocr_text)
+            if fallback_amount:
+                print(f"Regex fallback found amount: {fallback_amount}")
+                parsed_amount = fallback_amount
+            else:
+                print("Regex fallback also failed.")
+        
+        data["amount"] = parsed_amount
+        
+        return ReceiptData(**data)
+
+    def parse_receipt_with_llm(self, ocr_text: str) -> ReceiptData:
+        cache_key = self._cache_key(ocr_text)
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            return cached
+
+        if not self.client:
+            raise Exception("OpenAI Client not initialized. Check OPENAI_API_KEY.")
+
         try:
-            # To switch to Gemini or another provider, you would replace this call 
-            # with the respective SDK call (e.g., google.generativeai)
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # Or "gpt-4o" for better results
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that extracts data from receipts and returns JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                response_format={"type": "json_object"}
-            )
-
-            content = response.choices[0].message.content
-            data = json.loads(content)
-            
-            # --- ROBUSTNESS LAYER ---
-            # 1. Parse Amount
-            parsed_amount = parse_amount(data.get("amount"))
-            
-            # 2. Fallback if amount is missing or 0
-            if not parsed_amount:
-                print("LLM failed to extract amount. Trying regex fallback...")
-                fallback_amount = extract_amount_from_text(ocr_text)
-                if fallback_amount:
-                    print(f"Regex fallback found amount: {fallback_amount}")
-                    parsed_amount = fallback_amount
-                else:
-                    print("Regex fallback also failed.")
-            
-            data["amount"] = parsed_amount
-            
-            return ReceiptData(**data)
+            response = self.client.chat.completions.create(**self._completion_params(ocr_text))
+
+            self._log_usage(response)
+            receipt_data = self._to_receipt_data(response.choices[0].message.content, ocr_text)
+            self.cache.set(cache_key, receipt_data.model_copy(deep=True))
+            return receipt_data
 
         except Exception as e:
             print(f"LLM Parsing Error: {e}")
             # Fallback or re-raise
             raise e
 
-_llm_parser_service_instance = None
+    def _get_async_client(self) -> tuple[AsyncOpenAI, asyncio.Semaphore]:
+        """The running loop's async client and request semaphore (built on first use)."""
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            state = self._async.get(loop)
+            if state is None:
+                # Clients of closed loops can't be awaited any more: drop them
+                for old_loop in [old for old in self._async if old.is_closed()]:
+                    del self._async[old_loop]
+                http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.LLM_MAX_CONCURRENCY,
+                        max_keepalive_connections=settings.LLM_MAX_CONCURRENCY
+                    ),
+                    timeout=httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=10.0)
+                )
+                client = AsyncOpenAI(
+                    api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL, http_client=http_client
+                )
+                state = self._async[loop] = (client, asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY))
+        return state
+
+    async def parse_receipt_with_llm_async(self, ocr_text: str) -> ReceiptData:
+        """
+        Non-blocking variant of parse_receipt_with_llm for async routes.
+        Shares one keep-alive connection pool and caps in-flight requests
+        at LLM_MAX_CONCURRENCY.
+        """
+        cache_key = self._cache_key(ocr_text)
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            return cached
+
+        if not self.client:
+            raise Exception("OpenAI Client not initialized. Check OPENAI_API_KEY.")
+
+        client, semaphore = self._get_async_client()
+        try:
+            async with semaphore:
+                response = await client.chat.completions.create(**self._completion_params(ocr_text))
+
+            self._log_usage(response)
+            receipt_data = self._to_receipt_data(response.choices[0].message.content, ocr_text)
+            self.cache.set(cache_key, receipt_data.model_copy(deep=True))
+            return receipt_data
+
+        except Exception as e:
+            print(f"LLM Parsing Error: {e}")
+            raise e
+
+    @property
+    def batch_backend(self):
+        """Where batch requests go (OpenAI Batch API unless replaced)."""
+        if self._batch_backend is None:
+            if not self.client:
+                raise Exception("OpenAI Client not initialized. Check OPENAI_API_KEY.")
+            from app.services.llm_batch import OpenAIBatchBackend
+            self._batch_backend = OpenAIBatchBackend(self.client)
+        return self._batch_backend
+
+    @batch_backend.setter
+    def batch_backend(self, backend):
+        self._batch_backend = backend
+
+    def submit_batch(self, texts: dict[str, str]) -> str:
+        """
+        Sends {custom_id: ocr_text} as one batch of chat completions (the
+        same prompt as parse_receipt_with_llm) and returns the batch id.
+        """
+        lines = [
+            {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._completion_params(ocr_text)
+            }
+            for custom_id, ocr_text in texts.items()
+        ]
+        return self.batch_backend.submit(lines)
+
+    def batch_status(self, batch_id: str) -> dict:
+        return self.batch_backend.retrieve(batch_id)
+
+    def fetch_batch_results(self, batch: dict, texts: dict[str, str]) -> dict:
+        """
+        {custom_id: ReceiptData, or the Exception explaining why that
+        request failed} for a finished batch. Requests the batch never ran
+        are absent, so they can be sent again: those missing from the
+        output, and those reported as expired or cancelled in the error file.
+        """
+        results = {}
+        for line in self.batch_backend.fetch(batch):
+            custom_id = line.get("custom_id")
+            if (line.get("error") or {}).get("code") in UNRUN_BATCH_ERROR_CODES:
+                continue
+            ocr_text = texts.get(custom_id) or ""
+            response = line.get("response") or {}
+            try:
+                if line.get("error") or response.get("status_code") != 200:
+                    raise Exception(f"Batch request failed: {line.get('error') or response.get('body')}")
+                content = response["body"]["choices"][0]["message"]["content"]
+                receipt_data = self._to_receipt_data(content, ocr_text)
+                if ocr_text:
+                    self.cache.set(self._cache_key(ocr_text), receipt_data.model_copy(deep=True))
+                results[custom_id] = receipt_data
+            except Exception as e:
+                results[custom_id] = e
+        return results
+
+    async def aclose(self):
+        """Closes the running loop's async client."""
+        with self._async_lock:
+            state = self._async.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[0].close()
 
 def get_llm_parser_service() -> LLMParserService:
-    global _llm_parser_service_instance
-    if _llm_parser_service_instance is None:
-        _llm_parser_service_instance = LLMParserService()
-    return _llm_parser_service_instance
+    from app.services.registry import get_llm_parser_service
+    return get_llm_parser_service()
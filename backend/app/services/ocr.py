@@ -1,13 +1,36 @@
 from google.cloud import vision
 from google.oauth2 import service_account
 from app.config import settings
+from app.services.ocr_cache import ocr_cache
+from app.utils.image_loader import prepare_image_for_ocr, ImageTooLargeError
 import os
 import pypdfium2 as pdfium
-import io
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from app.utils.pdf_render import render_pdf_pages
+
+# Google Vision accepts at most 16 images per synchronous batch request
+VISION_MAX_BATCH_SIZE = 16
 
 class OCRService:
     def __init__(self):
         self.client = None
+        # Vision calls and PDF rendering are blocking: async callers run them
+        # on this bounded pool so the event loop keeps serving other requests.
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.OCR_MAX_WORKERS,
+            thread_name_prefix="ocr"
+        )
+        # Separate pool for the page batches of a single PDF: these are
+        # submitted from inside _executor, sharing it could deadlock.
+        self._page_executor = ThreadPoolExecutor(
+            max_workers=settings.OCR_PAGE_CONCURRENCY,
+            thread_name_prefix="ocr-page"
+        )
+        # Process pool for PDF rasterization, started on first scanned PDF
+        self._render_pool = None
         self.init_google_vision()
 
     def init_google_vision(self):
@@ -25,23 +48,61 @@ class OCRService:
         else:
             print("Warning: Google Cloud Vision credentials not found. OCR will fail.")
 
-    def extract_text(self, file_bytes: bytes, mime_type: str = None) -> str:
+    async def run_blocking(self, func, *args, **kwargs):
+        """
+        Runs a blocking callable on the OCR thread pool and awaits its result.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def extract_text_async(self, file_bytes: bytes, mime_type: str = None, content_hash: str = None,
+                                 persist_cache: bool = True) -> str:
+        """
+        Non-blocking variant of extract_text for use inside async routes.
+        """
+        return await self.run_blocking(self.extract_text, file_bytes, mime_type, content_hash, persist_cache)
+
+    async def extract_document_text_async(self, image_bytes: bytes, content_hash: str = None) -> str:
+        """
+        Non-blocking variant of extract_document_text for use inside async routes.
+        """
+        return await self.run_blocking(self.extract_document_text, image_bytes, content_hash)
+
+    def extract_text(self, file_bytes: bytes, mime_type: str = None, content_hash: str = None,
+                     persist_cache: bool = True) -> str:
         """
         Extract text from file (Image or PDF).
+        Results are cached by content hash, pass it if already computed.
+        With persist_cache=False the result is only cached in memory, never on disk.
         """
         # Simple detection if mime_type is not provided
-        if (mime_type == "application/pdf") or (file_bytes.startswith(b"%PDF")):
-            return self._extract_text_from_pdf(file_bytes)
+        is_pdf = (mime_type == "application/pdf") or (file_bytes.startswith(b"%PDF"))
+        mode = "pdf" if is_pdf else "text"
+
+        content_hash = content_hash or ocr_cache.hash_content(file_bytes)
+        cached = ocr_cache.get(content_hash, mode)
+        if cached is not None:
+            print(f"OCR cache hit ({mode}) for {content_hash}")
+            return cached
+
+        if is_pdf:
+            text = self._extract_text_from_pdf(file_bytes)
         else:
-            return self._extract_text_from_image(file_bytes)
+            text = self._extract_text_from_image(file_bytes)
+
+        if text:
+            ocr_cache.set(content_hash, mode, text, persist=persist_cache)
+        return text
 
     def _extract_text_from_pdf(self, pdf_bytes: bytes) -> str:
         try:
             pdf = pdfium.PdfDocument(pdf_bytes)
-            full_text = []
-            print(f"Processing PDF with {len(pdf)} pages...")
+            page_count = len(pdf)
+            full_text = [None] * page_count
+            ocr_pages = []  # indices of pages without a usable text layer
+            print(f"Processing PDF with {page_count} pages...")
             
-            for i in range(len(pdf)):
+            for i in range(page_count):
                 page = pdf[i]
                 
                 # Try direct text extraction first (much faster and accurate for digital PDFs)
@@ -52,39 +113,118 @@ class OCRService:
                     
                     if text and len(text.strip()) > 20: # Heuristic: if we got some text, use it
                         print(f"Page {i+1}: Successfully extracted text directly.")
-                        full_text.append(f"--- Page {i+1} (Direct) ---\n{text}")
+                        full_text[i] = f"--- Page {i+1} (Direct) ---\n{text}"
                         continue
                 except Exception as e:
                     print(f"Page {i+1}: Direct extraction failed ({e}), falling back to OCR.")
 
                 print(f"Page {i+1}: Falling back to OCR (Image Rendering).")
-                # Render page to image (scale=2 for better quality)
-                bitmap = page.render(scale=2)
-                pil_image = bitmap.to_pil()
-                
-                # Convert to bytes for Google Vision
-                img_byte_arr = io.BytesIO()
-                pil_image.save(img_byte_arr, format='PNG')
-                img_bytes = img_byte_arr.getvalue()
-                
-                # OCR the image
-                text = self._extract_text_from_image(img_bytes)
-                full_text.append(f"--- Page {i+1} (OCR) ---\n{text}")
+                ocr_pages.append(i)
+            pdf.close()
+
+            # Rasterize, then OCR all rendered pages together instead of one round trip per page
+            if ocr_pages:
+                images = self._render_pdf_pages(pdf_bytes, ocr_pages)
+                texts = self._extract_text_from_images(images)
+                for i, text in zip(ocr_pages, texts):
+                    full_text[i] = f"--- Page {i+1} (OCR) ---\n{text}"
                 
             return "\n".join(full_text)
         except Exception as e:
             print(f"PDF Processing Error: {e}")
             raise Exception(f"Failed to process PDF: {str(e)}")
 
+    def _get_render_pool(self):
+        # Spawned (not forked) workers: the parent holds gRPC threads
+        if self._render_pool is None and settings.PDF_RENDER_WORKERS > 0:
+            self._render_pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._render_pool
+
+    def _render_pdf_pages(self, pdf_bytes: bytes, page_indices: list[int]) -> list[bytes]:
+        """
+        Rasterizes pages for OCR on the render process pool, keeping the
+        CPU-heavy rendering and encoding off the web worker. Pages are split
+        into one chunk per worker so the PDF is sent to each process once.
+        """
+        render_options = {
+            "dpi": settings.PDF_RENDER_DPI,
+            "max_dimension": settings.OCR_IMAGE_MAX_DIMENSION,
+            "image_format": settings.PDF_RENDER_FORMAT.upper(),
+            "quality": settings.OCR_IMAGE_QUALITY
+        }
+        pool = self._get_render_pool()
+        if pool is None:
+            return render_pdf_pages(pdf_bytes, page_indices, **render_options)
+
+        n_chunks = min(settings.PDF_RENDER_WORKERS, len(page_indices))
+        chunks = [page_indices[i::n_chunks] for i in range(n_chunks)]
+        futures = [pool.submit(render_pdf_pages, pdf_bytes, chunk, **render_options) for chunk in chunks]
+
+        # Interleaved chunks: put images back in page order
+        rendered = {}
+        for chunk, future in zip(chunks, futures):
+            rendered.update(zip(chunk, future.result()))
+        return [rendered[i] for i in page_indices]
+
+    def _extract_text_from_images(self, images: list[bytes]) -> list[str]:
+        """
+        OCRs several images, returning their texts in input order.
+        Images are grouped into batch_annotate_images calls and the batches
+        run in parallel, so latency tracks the slowest batch rather than the
+        number of pages.
+        """
+        if not self.client:
+            raise Exception("Google Cloud Vision client not initialized")
+
+        batch_size = max(1, min(settings.OCR_BATCH_SIZE, VISION_MAX_BATCH_SIZE))
+        batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+
+        if len(batches) == 1:
+            results = [self._annotate_batch(batches[0])]
+        else:
+            results = list(self._page_executor.map(self._annotate_batch, batches))
+
+        return [text for batch_texts in results for text in batch_texts]
+
+    def _annotate_batch(self, images: list[bytes]) -> list[str]:
+        feature = vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)
+        requests = [
+            vision.AnnotateImageRequest(image=vision.Image(content=image_bytes), features=[feature])
+            for image_bytes in images
+        ]
+        response = self.client.batch_annotate_images(requests=requests)
+        return [self._text_from_response(r) for r in response.responses]
+
     def _extract_text_from_image(self, image_bytes: bytes) -> str:
         if not self.client:
             raise Exception("Google Cloud Vision client not initialized")
 
+        if settings.OCR_IMAGE_NORMALIZE:
+            image_bytes = self._normalize_image(image_bytes)
+
         image = vision.Image(content=image_bytes)
         
         # Perform text detection
         response = self.client.text_detection(image=image)
-        
+        return self._text_from_response(response)
+
+    def _normalize_image(self, image_bytes: bytes) -> bytes:
+        try:
+            normalized = prepare_image_for_ocr(image_bytes)
+        except ImageTooLargeError:
+            raise
+        except ValueError as e:
+            # Format PIL can't read (HEIC...): let Vision try the original
+            print(f"Image normalization skipped: {e}")
+            return image_bytes
+        if normalized is not image_bytes:
+            print(f"Image normalized for OCR: {len(image_bytes)} -> {len(normalized)} bytes")
+        return normalized
+
+    def _text_from_response(self, response) -> str:
         if response.error.message:
             raise Exception(f"Google Vision API Error: {response.error.message}")
 
@@ -94,4 +234,27 @@ class OCRService:
         # The first annotation contains the full text
         return response.text_annotations[0].description
 
-ocr_service = OCRService()
+    def extract_document_text(self, image_bytes: bytes, content_hash: str = None) -> str:
+        """
+        Dense-text OCR (document_text_detection), better suited to long invoices.
+        """
+        content_hash = content_hash or ocr_cache.hash_content(image_bytes)
+        cached = ocr_cache.get(content_hash, "document")
+        if cached is not None:
+            return cached
+
+        if not self.client:
+            raise Exception("Google Cloud Vision client not initialized")
+
+        image = vision.Image(content=image_bytes)
+        response = self.client.document_text_detection(image=image)
+
+        if response.error.message:
+            raise Exception(f"Google Vision API Error: {response.error.message}")
+
+        if not response.full_text_annotation:
+            return ""
+
+        text = response.full_text_annotation.text
+        ocr_cache.set(content_hash, "document", text)
+        return text
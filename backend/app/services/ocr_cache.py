@@ -0,0 +1,104 @@
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Optional
+from app.config import settings
+from app.utils.cache import LRUCache
+
+class OCRCache:
+    """
+    Content-addressed OCR result cache.
+
+    Keys are the hash of the file bytes plus the OCR mode, so the same file
+    never reaches Google Vision twice. Lookups go to a bounded in-memory LRU
+    first, then to text files on disk (which survive restarts).
+    """
+
+    def __init__(self, max_entries: int = 512, cache_dir: Optional[str] = None):
+        self.memory = LRUCache(max_entries=max_entries)
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError as e:
+                print(f"OCR cache: disk tier disabled ({e})")
+                self.cache_dir = None
+
+    @staticmethod
+    def hash_content(file_bytes: bytes) -> str:
+        return hashlib.md5(file_bytes).hexdigest()
+
+    @staticmethod
+    def make_key(content_hash: str, mode: str) -> str:
+        return f"{content_hash}-{mode}"
+
+    def _path(self, key: str) -> str:
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def get(self, content_hash: str, mode: str) -> Optional[str]:
+        key = self.make_key(content_hash, mode)
+
+        text = self.memory.get(key)
+        if text is not None:
+            return text
+
+        if self.cache_dir:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    text = f.read()
+                self.memory.set(key, text)
+                with self._lock:
+                    self.disk_hits += 1
+                return text
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"OCR cache read error for {key}: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, content_hash: str, mode: str, text: str, persist: bool = True):
+        """persist=False keeps the text in memory only (never written to disk)."""
+        key = self.make_key(content_hash, mode)
+        self.memory.set(key, text)
+
+        if not self.cache_dir or not persist:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"OCR cache write error for {key}: {e}")
+
+    def stats(self) -> dict:
+        memory_stats = self.memory.stats()
+        memory_hits = memory_stats["hits"]
+        lookups = memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round((memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": memory_stats["entries"],
+            "disk_enabled": self.cache_dir is not None,
+        }
+
+def _default_cache_dir() -> Optional[str]:
+    if not settings.OCR_CACHE_DISK:
+        return None
+    return settings.OCR_CACHE_DIR or os.path.join(tempfile.gettempdir(), "novareceipt_ocr_cache")
+
+ocr_cache = OCRCache(max_entries=settings.OCR_CACHE_MAX_ENTRIES, cache_dir=_default_cache_dir())
@@ -1,117 +1,129 @@
-import re
-from typing import Dict, Any, List
-from app.models.receipt import ReceiptData, ReceiptItem
+from datetime import date as date_type
+from app.models.receipt import ReceiptData, ReceiptItem, ExpenseCategory
+from app.utils.text_scan import scan_text, is_numeric_line, TextScan, CATEGORY_KEYWORDS
+
+# Lines that name the document, not the business
+GENERIC_HEADERS = ("facture", "ticket", "receipt", "invoice", "bienvenue", "welcome", "duplicata")
 
 class ParserService:
+    """
+    Local heuristic parser: no network, well under a millisecond per receipt.
+    Every extracted field comes with a confidence in [0, 1] so callers can
+    decide whether the result is good enough or needs the LLM.
+    """
+
     def parse_receipt(self, text: str) -> ReceiptData:
         """
         Parses raw OCR text into structured ReceiptData.
         """
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        
-        merchant = self._extract_merchant(lines)
-        date = self._extract_date(text)
-        amount = self._extract_total_amount(text)
-        vat = self._extract_vat(text)
-        category = self._categorize_expense(text, merchant)
-        
+        receipt, _ = self.parse_with_confidence(text)
+        return receipt
+
+    def parse_with_confidence(self, text: str) -> tuple[ReceiptData, dict]:
+        """ReceiptData plus {field: confidence} for merchant, amount, date, vat_amount, category."""
+        # One scan of the text, shared by every extractor below
+        scan = scan_text(text)
+
+        merchant, merchant_confidence = self._extract_merchant(scan)
+        date, date_confidence = self._extract_date(scan)
+        amount, amount_confidence = self._extract_total_amount(scan)
+        vat, vat_confidence = self._extract_vat(scan, amount)
+        category, category_confidence = self._categorize_expense(scan)
+        confidences = {
+            "merchant": merchant_confidence,
+            "amount": amount_confidence,
+            "date": date_confidence,
+            "vat_amount": vat_confidence,
+            "category": category_confidence,
+        }
+
         # Basic item extraction (simplified)
         # In a real app, this would be much more complex or use an LLM
         items = []
-        if amount > 0:
-            items.append(ReceiptItem(description="Total Expense", amount=amount, vat=vat))
+        if amount:
+            items.append(ReceiptItem(description="Total Expense", amount=amount, vat=vat or 0.0))
 
-        return ReceiptData(
+        receipt = ReceiptData(
             merchant=merchant,
             date=date,
             amount=amount,
-            vat=vat,
+            currency=self._detect_currency(scan),
+            vat_amount=vat,
             category=category,
-            items=items
+            category_confidence=category_confidence,
+            items=items,
+            confidence=min(merchant_confidence, amount_confidence, date_confidence)
         )
+        return receipt, confidences
 
-    def _extract_merchant(self, lines: List[str]) -> str:
+    def _extract_merchant(self, scan: TextScan) -> tuple[str, float]:
         # Heuristic: The first non-empty line that looks like a name is often the merchant
-        # We skip lines that look like dates or just numbers
-        for line in lines[:5]: # Check first 5 lines
-            if len(line) > 2 and not re.match(r'^[\d\s\.\-\/]+$', line):
-                return line
-        return "Unknown Merchant"
-
-    def _extract_date(self, text: str) -> str:
-        # Regex for dd/mm/yyyy, yyyy-mm-dd, dd-mm-yyyy
-        date_patterns = [
-            r'(\d{2}[/-]\d{2}[/-]\d{4})',
-            r'(\d{4}[/-]\d{2}[/-]\d{2})'
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(1)
-        return None
-
-    def _extract_total_amount(self, text: str) -> float:
-        # Look for "Total" followed by numbers
-        # Or just look for the largest number with a currency symbol
-        
-        # Normalize text: replace commas with dots for float parsing
-        normalized_text = text.replace(',', '.')
-        
-        # Regex to find amounts like 12.50, 1,200.00
-        # We look for lines containing "Total" or "Montant" first
-        total_lines = re.findall(r'(?i)(total|montant|somme|payé).{0,20}(\d+\.\d{2})', normalized_text)
-        if total_lines:
-            # Return the last one found (often the grand total)
-            try:
-                return float(total_lines[-1][1])
-            except:
-                pass
-        
-        # Fallback: Find all currency-like numbers and take the max
-        amounts = re.findall(r'(\d+\.\d{2})', normalized_text)
-        valid_amounts = []
-        for amt in amounts:
-            try:
-                val = float(amt)
-                if val < 10000: # Sanity check
-                    valid_amounts.append(val)
-            except:
+        # We skip lines that look like dates or just numbers, and document headers
+        for index, line in enumerate(scan.head(5)): # Check first 5 lines
+            if len(line) <= 2 or is_numeric_line(line):
+                continue
+            if any(header in line.lower() for header in GENERIC_HEADERS):
                 continue
-        
-        if valid_amounts:
-            return max(valid_amounts)
-            
-        return 0.0
-
-    def _extract_vat(self, text: str) -> float:
-        # Regex for TVA, VAT
-        normalized_text = text.replace(',', '.')
-        vat_matches = re.findall(r'(?i)(tva|vat|tax).{0,10}(\d+\.\d{2})', normalized_text)
-        
-        if vat_matches:
-            # Sum up all found VATs or take the largest? 
-            # Usually there are multiple rates, let's take the largest found value that is smaller than total
-            try:
-                vats = [float(m[1]) for m in vat_matches]
-                return max(vats)
-            except:
-                pass
-        return 0.0
-
-    def _categorize_expense(self, text: str, merchant: str) -> str:
-        text_lower = text.lower()
-        merchant_lower = merchant.lower()
-        
-        if any(x in text_lower or x in merchant_lower for x in ['restaurant', 'food', 'burger', 'pizza', 'cafe', 'coffee', 'starbucks', 'mcdo']):
-            return "Restaurant"
-        if any(x in text_lower or x in merchant_lower for x in ['uber', 'taxi', 'train', 'sncf', 'transport', 'flight', 'parking']):
-            return "Transport"
-        if any(x in text_lower or x in merchant_lower for x in ['hotel', 'airbnb', 'logement']):
-            return "Logement"
-        if any(x in text_lower or x in merchant_lower for x in ['essence', 'fuel', 'total', 'shell', 'bp']):
-            return "Carburant"
-            
-        return "Autre"
-
-parser_service = ParserService()
+            confidence = 0.9 if index == 0 else 0.75
+            letters = sum(char.isalpha() for char in line)
+            if letters / len(line) < 0.6:
+                # Mostly digits/symbols: an address or a reference more likely than a name
+                confidence -= 0.3
+            return line, confidence
+        return "Unknown Merchant", 0.0
+
+    def _extract_date(self, scan: TextScan) -> tuple[str | None, float]:
+        raw = scan.date
+        if not raw:
+            return None, 0.0
+        parts = raw.replace("/", "-").split("-")
+        year, month, day = (parts[2], parts[1], parts[0]) if len(parts[0]) == 2 else parts
+        try:
+            parsed = date_type(int(year), int(month), int(day))
+        except ValueError:
+            # Matched the pattern but is not a calendar date (OCR misread)
+            return None, 0.0
+        if not 2000 <= parsed.year <= date_type.today().year + 1:
+            return parsed.isoformat(), 0.4
+        return parsed.isoformat(), 0.9
+
+    def _extract_total_amount(self, scan: TextScan) -> tuple[float | None, float]:
+        # Look for "Total" followed by numbers, the last one is often the grand total
+        candidates = [amount for amount in scan.amounts if amount < 10000] # Sanity check
+        if scan.totals:
+            total = scan.totals[-1]
+            confidence = 0.7
+            if total > 0 and total >= max(candidates, default=0.0):
+                # Nothing on the receipt exceeds it (no change given, no bigger total)
+                confidence += 0.2
+            if scan.vat_amounts and max(scan.vat_amounts) < total:
+                confidence += 0.05
+            return total, confidence
+
+        # Fallback: take the largest currency-like number
+        if candidates:
+            return max(candidates), 0.3
+
+        return None, 0.0
+
+    def _extract_vat(self, scan: TextScan, total: float | None) -> tuple[float | None, float]:
+        # Usually there are multiple rates, take the largest found value that is smaller than total
+        vats = [vat for vat in scan.vat_amounts if total is None or vat < total]
+        if not vats:
+            return None, 0.0
+        return max(vats), 0.8 if total else 0.5
+
+    def _categorize_expense(self, scan: TextScan) -> tuple[ExpenseCategory, float]:
+        # The merchant is one of the scanned lines, so its keywords are in the scan too
+        for category, keywords in CATEGORY_KEYWORDS:
+            if not scan.keywords.isdisjoint(keywords):
+                return ExpenseCategory[category], 0.6
+
+        return ExpenseCategory.AUTRE, 0.2
+
+    def _detect_currency(self, scan: TextScan) -> str:
+        if "$" in scan.text or "usd" in scan.lower:
+            return "USD"
+        if "£" in scan.text or "gbp" in scan.lower:
+            return "GBP"
+        return "EUR"
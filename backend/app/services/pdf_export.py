@@ -1,20 +1,32 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
+from app.config import settings
+from typing import Iterable
 import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from app.models.receipt import ReceiptData
 
+# reportlab and pypdfium2 (via app.utils.pdf_report) are imported on first
+# render, not when the API starts
+
+# Receipt fields read by generate_report
+REPORT_COLUMNS = "id,created_at,merchant,date,amount,currency,category,vat_amount:raw_json->vat_amount"
+
 class PDFExportService:
+    def __init__(self):
+        self._report_pool = None
+
     def generate_pdf(self, receipt: ReceiptData) -> bytes:
         """
         Generates a PDF summary from ReceiptData and returns the bytes.
         """
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
+        from app.utils.pdf_report import get_styles, INFO_TABLE_STYLE, ITEMS_TABLE_STYLE
+
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter)
         elements = []
-        styles = getSampleStyleSheet()
+        styles = get_styles()
 
         # Title
         elements.append(Paragraph("NovaReceipt – Parsed Data", styles['Title']))
@@ -24,17 +36,13 @@ class PDFExportService:
         info_data = [
             ["Merchant:", receipt.merchant],
             ["Date:", receipt.date or "N/A"],
-            ["Category:", receipt.category],
-            ["Total Amount:", f"{receipt.amount:.2f} {receipt.currency}"],
+            ["Category:", getattr(receipt.category, "value", receipt.category)],
+            ["Total Amount:", f"{receipt.amount:.2f} {receipt.currency}" if receipt.amount is not None else "N/A"],
             ["VAT:", f"{receipt.vat_amount:.2f} {receipt.currency}" if receipt.vat_amount else "0.00"]
         ]
         
         t_info = Table(info_data, colWidths=[100, 300])
-        t_info.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
+        t_info.setStyle(INFO_TABLE_STYLE)
         elements.append(t_info)
         elements.append(Spacer(1, 20))
 
@@ -52,15 +60,7 @@ class PDFExportService:
                 ])
             
             t_items = Table(items_data, colWidths=[300, 80, 80])
-            t_items.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ]))
+            t_items.setStyle(ITEMS_TABLE_STYLE)
             elements.append(t_items)
 
         # Footer
@@ -70,4 +70,54 @@ class PDFExportService:
         doc.build(elements)
         return buffer.getvalue()
 
-pdf_export_service = PDFExportService()
+    def _get_report_pool(self):
+        # Spawned like the OCR render pool: the parent holds network client threads
+        if self._report_pool is None and settings.PDF_REPORT_WORKERS > 0:
+            self._report_pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_REPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._report_pool
+
+    def generate_report(self, receipts: Iterable[dict], title: str = "Expense Report", subtitle: str = "") -> bytes:
+        """
+        Renders many receipts rows (merchant, date, amount, currency, category,
+        vat_amount) into one PDF: a summary page with per-category subtotals,
+        then the receipts grouped by category.
+
+        The detail is cut into PDF_REPORT_CHUNK_SIZE-line slices rendered in
+        worker processes, then the parts are merged page by page.
+        """
+        from app.utils.pdf_report import render_report_summary, render_report_chunk, merge_pdfs
+
+        groups = {}
+        for row in receipts:
+            key = (row.get("category") or "AUTRE", row.get("currency") or "EUR")
+            groups.setdefault(key, []).append((
+                "receipt", row.get("date"), row.get("merchant"), key[0],
+                row.get("amount"), row.get("vat_amount"), key[1]
+            ))
+
+        totals = []
+        lines = []
+        for (category, currency), rows in sorted(groups.items()):
+            rows.sort(key=lambda line: line[1] or "")
+            amount = sum(line[4] or 0.0 for line in rows)
+            vat = sum(line[5] or 0.0 for line in rows)
+            totals.append((category, currency, len(rows), amount, vat))
+            lines.append(("category", f"{category} ({currency})"))
+            lines.extend(rows)
+            lines.append(("subtotal", category, len(rows), amount, vat, currency))
+
+        if not subtitle:
+            subtitle = f"{sum(total[2] for total in totals)} receipts"
+        parts = [render_report_summary(title, subtitle, totals)]
+
+        chunk_size = settings.PDF_REPORT_CHUNK_SIZE
+        chunks = [lines[i:i + chunk_size] for i in range(0, len(lines), chunk_size)]
+        pool = self._get_report_pool()
+        if pool is None or len(chunks) < 2:
+            parts.extend(render_report_chunk(chunk) for chunk in chunks)
+        else:
+            parts.extend(pool.map(render_report_chunk, chunks))
+        return merge_pdfs(parts)
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import json
+import weakref
+from app.config import settings
+from app.models.receipt import ReceiptData, ReceiptItem, ExpenseCategory
+from app.utils.cache import LRUCache
+from app.services.registry import (
+    get_jobs_service, get_storage_service, get_pdf_export_service, get_excel_export_service
+)
+
+# Bump when the PDF/Excel layout changes: every export is then regenerated
+EXPORT_VERSION = "1"
+
+EXPORT_FORMATS = {
+    "pdf": {
+        "column": "pdf_url",
+        "extension": "pdf",
+        "content_type": "application/pdf",
+    },
+    "excel": {
+        "column": "excel_url",
+        "extension": "xlsx",
+        "content_type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    },
+}
+
+# What a single-receipt export is rendered from: the edited columns plus
+# the parsed fields that only live in raw_json (never the OCR text)
+EXPORT_SOURCE_COLUMNS = (
+    "id,status,merchant,date,amount,currency,category,pdf_url,excel_url,"
+    "vat_amount:raw_json->vat_amount,items:raw_json->items,document_type:raw_json->document_type"
+)
+
+class ReceiptNotReadyError(Exception):
+    pass
+
+def _parse_items(items) -> list[ReceiptItem]:
+    parsed = []
+    for item in items or []:
+        try:
+            parsed.append(ReceiptItem(**item))
+        except Exception:
+            continue  # Malformed line item: left out of the export
+    return parsed
+
+def receipt_from_row(row: dict) -> ReceiptData:
+    category = row.get("category")
+    if category not in ExpenseCategory.__members__:
+        category = ExpenseCategory.AUTRE
+    document_type = row.get("document_type")
+    return ReceiptData(
+        merchant=row.get("merchant") or "Unknown Merchant",
+        date=row.get("date"),
+        amount=row.get("amount"),
+        currency=row.get("currency") or "EUR",
+        vat_amount=row.get("vat_amount"),
+        category=category,
+        items=_parse_items(row.get("items")),
+        document_type=document_type if document_type in ("invoice", "receipt", "other") else "receipt",
+    )
+
+def export_fingerprint(receipt: ReceiptData) -> str:
+    """Changes whenever the rendered content would change."""
+    payload = json.dumps(
+        {"version": EXPORT_VERSION, "receipt": receipt.model_dump(mode="json")},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+class ReceiptExportService:
+    """
+    Generates a receipt's PDF/Excel export on first download.
+
+    The object path embeds a fingerprint of the receipt content, so the URL
+    recorded on the receipt is reused until the receipt changes, and a
+    stale URL is detected by comparing fingerprints, without extra state.
+    Concurrent requests for the same export wait on one lock per
+    (receipt, format) and reuse the first render.
+    """
+
+    def __init__(self):
+        self._locks = weakref.WeakValueDictionary()
+        # (receipt_id, format) -> (fingerprint, url) rendered by this process
+        self._rendered = LRUCache(max_entries=1024)
+
+    def _lock_for(self, key) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    async def get_export_url(self, receipt_id: str, export_format: str) -> str:
+        """
+        Returns the export URL, rendering and uploading it if needed.
+        Raises LookupError for unknown receipts, ReceiptNotReadyError before
+        processing succeeded.
+        """
+        spec = EXPORT_FORMATS[export_format]
+        # Straight from the database: the receipt may have been edited by
+        # another process, and the export must render what is stored
+        row = await get_jobs_service().get_job_async(
+            receipt_id, columns=EXPORT_SOURCE_COLUMNS, use_cache=False
+        )
+        if not row:
+            raise LookupError(f"Receipt {receipt_id} not found")
+        if row.get("status") != "success":
+            raise ReceiptNotReadyError(f"Receipt {receipt_id} is not processed yet")
+
+        receipt = receipt_from_row(row)
+        fingerprint = export_fingerprint(receipt)
+        object_path = f"{receipt_id}/{fingerprint}.{spec['extension']}"
+        stored_url = row.get(spec["column"])
+        if stored_url and object_path in stored_url:
+            return stored_url
+
+        key = (receipt_id, export_format)
+        async with self._lock_for(key):
+            # Rendered by a concurrent request while we waited
+            rendered = self._rendered.get(key)
+            if rendered and rendered[0] == fingerprint:
+                return rendered[1]
+
+            print(f"[{receipt_id}] Rendering {export_format} export ({fingerprint})")
+            if export_format == "pdf":
+                content = await asyncio.to_thread(get_pdf_export_service().generate_pdf, receipt)
+                bucket = settings.BUCKET_PDF
+            else:
+                content = await asyncio.to_thread(get_excel_export_service().generate_excel, receipt)
+                bucket = settings.BUCKET_EXCEL
+
+            url = await get_storage_service().upload_file_async(bucket, object_path, content, spec["content_type"])
+            get_jobs_service().record_export_url(receipt_id, spec["column"], url)
+            self._rendered.set(key, (fingerprint, url))
+
+        if stored_url:
+            await self._delete_stale(bucket, stored_url, object_path)
+        return url
+
+    async def _delete_stale(self, bucket: str, stored_url: str, object_path: str):
+        # Best effort: a leftover object only costs storage
+        marker = f"/{bucket}/"
+        if marker not in stored_url:
+            return
+        stale_path = stored_url.split(marker, 1)[1].split("?", 1)[0]
+        if stale_path == object_path:
+            return
+        try:
+            await asyncio.to_thread(get_storage_service().delete_file, bucket, stale_path)
+        except Exception as e:
+            print(f"Failed to delete stale export {stale_path}: {e}")
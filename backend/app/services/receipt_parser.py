@@ -0,0 +1,130 @@
+import random
+import re
+import threading
+from app.config import settings
+from app.models.receipt import ReceiptData
+from app.services.registry import get_llm_parser_service, get_parser_service
+
+# Fields that decide whether the heuristic result is used as is
+GATED_FIELDS = ("merchant", "amount", "date")
+
+def _thresholds() -> dict:
+    return {
+        "merchant": settings.PARSER_MIN_MERCHANT_CONFIDENCE,
+        "amount": settings.PARSER_MIN_AMOUNT_CONFIDENCE,
+        "date": settings.PARSER_MIN_DATE_CONFIDENCE,
+    }
+
+def _same_merchant(a: str, b: str) -> bool:
+    a, b = (re.sub(r"[^a-z0-9]", "", (value or "").lower()) for value in (a, b))
+    return bool(a and b) and (a in b or b in a)
+
+def _same_amount(a, b) -> bool:
+    return a is not None and b is not None and abs(float(a) - float(b)) < 0.01
+
+def fields_agree(field: str, heuristic: ReceiptData, llm: ReceiptData) -> bool:
+    if field == "merchant":
+        return _same_merchant(heuristic.merchant, llm.merchant)
+    if field == "amount":
+        return _same_amount(heuristic.amount, llm.amount)
+    return heuristic.date is not None and heuristic.date == llm.date
+
+class ReceiptParserService:
+    """
+    Parsing cascade: the local heuristic parser first, the LLM only when
+    merchant, amount or date are below their confidence threshold.
+
+    Whenever both results exist (receipts that went to the LLM, plus a
+    PARSER_SHADOW_SAMPLE_RATE share of fast-path ones), the heuristic fields
+    that cleared their threshold are compared with the LLM's, which shows
+    whether the thresholds can be lowered or must be raised.
+    """
+
+    def __init__(self):
+        self.heuristic = get_parser_service()
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.fast_path = 0
+        self.llm_calls = 0
+        self.deferred = 0
+        # field -> [heuristic fields above threshold compared with the LLM, agreeing]
+        self.agreement = {field: [0, 0] for field in GATED_FIELDS}
+
+    def _record(self, fast_path: bool, heuristic: ReceiptData, confidences: dict, llm: ReceiptData = None) -> dict:
+        thresholds = _thresholds()
+        compared = {}
+        if llm is not None:
+            for field in GATED_FIELDS:
+                if confidences[field] >= thresholds[field]:
+                    compared[field] = fields_agree(field, heuristic, llm)
+        with self._lock:
+            self.parsed += 1
+            self.fast_path += fast_path
+            self.llm_calls += llm is not None
+            for field, agreed in compared.items():
+                self.agreement[field][0] += 1
+                self.agreement[field][1] += agreed
+        return compared
+
+    async def parse_async(self, ocr_text: str, defer_llm: bool = False) -> tuple[ReceiptData, dict]:
+        """
+        Returns the ReceiptData and a summary of the decision (source,
+        confidences, fields below threshold, agreement with the LLM) for
+        the job trace.
+
+        With defer_llm, a receipt that needs the LLM is not sent to it:
+        the decision's source is "llm_batch" and the caller queues it for
+        the Batch API (the heuristic result is returned as a placeholder).
+        """
+        heuristic, confidences = self.heuristic.parse_with_confidence(ocr_text)
+        thresholds = _thresholds()
+        low = [field for field in GATED_FIELDS if confidences[field] < thresholds[field]]
+        fast_path = settings.PARSER_FAST_PATH_ENABLED and not low
+        decision = {
+            "source": "heuristic" if fast_path else "llm",
+            "confidences": confidences,
+            "below_threshold": low,
+        }
+
+        if fast_path:
+            shadow = None
+            if settings.PARSER_SHADOW_SAMPLE_RATE > 0 and random.random() < settings.PARSER_SHADOW_SAMPLE_RATE:
+                try:
+                    shadow = await get_llm_parser_service().parse_receipt_with_llm_async(ocr_text)
+                except Exception as e:
+                    print(f"Shadow LLM parse failed: {e}")
+            decision["agreement"] = self._record(True, heuristic, confidences, shadow)
+            return heuristic, decision
+
+        if defer_llm:
+            decision["source"] = "llm_batch"
+            with self._lock:
+                self.deferred += 1
+            return heuristic, decision
+
+        receipt = await get_llm_parser_service().parse_receipt_with_llm_async(ocr_text)
+        decision["agreement"] = self._record(False, heuristic, confidences, receipt)
+        return receipt, decision
+
+    def record_llm_result(self, ocr_text: str, receipt: ReceiptData) -> dict:
+        """Counts a batch result (often in the batch runner, not the process that deferred it)."""
+        heuristic, confidences = self.heuristic.parse_with_confidence(ocr_text)
+        return self._record(False, heuristic, confidences, receipt)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "parsed": self.parsed,
+                "fast_path": self.fast_path,
+                "llm_calls": self.llm_calls,
+                "deferred_to_batch": self.deferred,
+                "fast_path_ratio": round(self.fast_path / self.parsed, 4) if self.parsed else 0.0,
+                "agreement": {
+                    field: {
+                        "compared": compared,
+                        "agreed": agreed,
+                        "ratio": round(agreed / compared, 4) if compared else None,
+                    }
+                    for field, (compared, agreed) in self.agreement.items()
+                },
+            }
@@ -0,0 +1,170 @@
+"""
+Process-wide services, constructed on first use.
+
+Importing the API must stay cheap (cold starts on Render/Vercel): the
+modules behind these getters pull in pandas, reportlab, pypdfium2, the
+Vision/OpenAI SDKs and open network clients. Nothing here imports them
+until a getter is called, and each service is built exactly once per
+process, even when first requested from several threads at once.
+"""
+import threading
+
+_factories = {}
+_instances = {}
+_lock = threading.RLock()
+
+def register(name: str, factory):
+    """Registers (or replaces) the factory building service `name`."""
+    with _lock:
+        _factories[name] = factory
+        _instances.pop(name, None)
+
+def get(name: str):
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    with _lock:
+        instance = _instances.get(name)
+        if instance is None:
+            instance = _factories[name]()
+            _instances[name] = instance
+        return instance
+
+def peek(name: str):
+    """The service if it was already built, else None (never builds it)."""
+    return _instances.get(name)
+
+def reset(name: str = None):
+    """Drops built instances so the next get() rebuilds them."""
+    with _lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
+
+# --- Factories: imports happen inside, on first use ---
+
+def _supabase():
+    from app.services.supabase_client import SupabaseClients
+    return SupabaseClients()
+
+def _jobs_service():
+    from app.services.jobs import JobsService
+    return JobsService()
+
+def _storage_service():
+    from app.services.storage import StorageService
+    return StorageService()
+
+def _ocr_service():
+    from app.services.ocr import OCRService
+    return OCRService()
+
+def _llm_parser_service():
+    from app.services.llm_parser import LLMParserService
+    return LLMParserService()
+
+def _parser_service():
+    from app.services.parser import ParserService
+    return ParserService()
+
+def _receipt_parser_service():
+    from app.services.receipt_parser import ReceiptParserService
+    return ReceiptParserService()
+
+def _excel_export_service():
+    from app.services.excel_export import ExcelExportService
+    return ExcelExportService()
+
+def _pdf_export_service():
+    from app.services.pdf_export import PDFExportService
+    return PDFExportService()
+
+def _receipt_export_service():
+    from app.services.receipt_exports import ReceiptExportService
+    return ReceiptExportService()
+
+def _artifacts_service():
+    from app.services.artifacts import ReceiptArtifactsService
+    return ReceiptArtifactsService()
+
+def _llm_batch_service():
+    from app.services.llm_batch import LLMBatchService
+    return LLMBatchService()
+
+def _event_bus():
+    from app.config import settings
+    from app.services.events import EventBus, SupabaseBroadcastBackend
+    backend = None
+    if settings.EVENTS_BACKEND == "supabase":
+        backend = SupabaseBroadcastBackend(get_supabase(), settings.EVENTS_CHANNEL)
+    return EventBus(backend, replay_ttl=settings.EVENTS_REPLAY_TTL_SECONDS)
+
+def _job_queue():
+    from app.services.job_queue import SupabaseJobQueue
+    return SupabaseJobQueue()
+
+register("supabase", _supabase)
+register("jobs", _jobs_service)
+register("storage", _storage_service)
+register("ocr", _ocr_service)
+register("llm_parser", _llm_parser_service)
+register("parser", _parser_service)
+register("receipt_parser", _receipt_parser_service)
+register("excel_export", _excel_export_service)
+register("pdf_export", _pdf_export_service)
+register("receipt_exports", _receipt_export_service)
+register("artifacts", _artifacts_service)
+register("llm_batch", _llm_batch_service)
+register("events", _event_bus)
+register("job_queue", _job_queue)
+
+def get_supabase():
+    """The shared data-access layer (sync client + async helpers)."""
+    return get("supabase")
+
+def get_supabase_client():
+    """The shared sync Supabase client."""
+    return get("supabase").client
+
+def get_jobs_service():
+    return get("jobs")
+
+def get_storage_service():
+    return get("storage")
+
+def get_ocr_service():
+    return get("ocr")
+
+def get_llm_parser_service():
+    return get("llm_parser")
+
+def get_parser_service():
+    """The local heuristic parser."""
+    return get("parser")
+
+def get_receipt_parser_service():
+    """Heuristic-first parsing cascade (falls back to the LLM)."""
+    return get("receipt_parser")
+
+def get_excel_export_service():
+    return get("excel_export")
+
+def get_pdf_export_service():
+    return get("pdf_export")
+
+def get_receipt_export_service():
+    return get("receipt_exports")
+
+def get_artifacts_service():
+    return get("artifacts")
+
+def get_llm_batch_service():
+    return get("llm_batch")
+
+def get_event_bus():
+    """Job progress pub/sub (feeds the SSE status stream)."""
+    return get("events")
+
+def get_job_queue():
+    return get("job_queue")
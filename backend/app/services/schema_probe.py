@@ -0,0 +1,92 @@
+import threading
+import time
+
+# Columns that older deployed schemas may lack, per table
+OPTIONAL_COLUMNS = {
+    "receipts": ("updated_at", "excel_url", "pdf_url"),
+    "jobs_processing": ("updated_at",),
+}
+
+def is_missing_column_error(e: Exception) -> bool:
+    message = str(e)
+    return "PGRST204" in message or "42703" in message
+
+class SchemaCapabilities:
+    """
+    Knows which optional columns exist in the deployed schema.
+
+    Each table is probed with a zero-row SELECT of its optional columns
+    (falling back to one column at a time only when that fails). Results
+    are cached for `ttl` seconds, so writes are built against the real
+    schema instead of failing and retrying on every call.
+
+    A probe that can't tell (missing table, network error) keeps the last
+    known result and is retried after `retry_delay`, doubling on each
+    failure up to `ttl`, so an outage doesn't add a probe to every write.
+    """
+
+    def __init__(self, client, ttl: float = 600.0, optional_columns: dict = OPTIONAL_COLUMNS,
+                 retry_delay: float = 5.0):
+        self.supabase = client
+        self.ttl = ttl
+        self.retry_delay = retry_delay
+        self.optional_columns = optional_columns
+        self._missing: dict[str, set] = {}
+        self._expires_at: dict[str, float] = {}
+        self._failures: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, table: str = None):
+        tables = [table] if table else list(self.optional_columns)
+        for name in tables:
+            missing = self._probe(name)
+            if missing is None:
+                with self._lock:
+                    failures = self._failures.get(name, 0)
+                    self._failures[name] = failures + 1
+                    delay = min(self.retry_delay * 2 ** failures, self.ttl)
+                    self._expires_at[name] = time.monotonic() + delay
+                continue
+            with self._lock:
+                self._missing[name] = missing
+                self._failures.pop(name, None)
+                self._expires_at[name] = time.monotonic() + self.ttl
+            if missing:
+                print(f"Schema probe: {name} lacks optional columns {sorted(missing)}")
+
+    def _probe(self, table: str):
+        columns = self.optional_columns.get(table, ())
+        if not columns:
+            return set()
+        try:
+            self.supabase.table(table).select(",".join(columns)).limit(0).execute()
+            return set()
+        except Exception as e:
+            if not is_missing_column_error(e):
+                # Can't tell (missing table, network error...): keep what we knew, retry later
+                print(f"Schema probe for {table} failed: {e}")
+                return None
+
+        missing = set()
+        for column in columns:
+            try:
+                self.supabase.table(table).select(column).limit(0).execute()
+            except Exception as e:
+                if is_missing_column_error(e):
+                    missing.add(column)
+        return missing
+
+    def missing_columns(self, table: str) -> set:
+        with self._lock:
+            expires_at = self._expires_at.get(table)
+        if expires_at is None or time.monotonic() > expires_at:
+            self.refresh(table)
+        with self._lock:
+            return self._missing.get(table, set())
+
+    def filter(self, table: str, fields: dict) -> dict:
+        """Drops the columns the table is known not to have."""
+        missing = self.missing_columns(table)
+        if not missing:
+            return fields
+        return {k: v for k, v in fields.items() if k not in missing}
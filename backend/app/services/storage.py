@@ -1,31 +1,39 @@
-from supabase import create_client, Client
-from ..config import settings
+import io
 import time
+from typing import BinaryIO
 
 class StorageService:
     def __init__(self):
-        self.supabase: Client = None
+        self.supabase = None
+        self.db = None
         self._connect()
 
     def _connect(self):
         try:
-            self.supabase = create_client(
-                settings.SUPABASE_URL,
-                settings.SUPABASE_SERVICE_KEY,
-            )
+            from app.services.registry import get_supabase
+            # Shared pooled clients: sync for threads, self.db for async callers
+            self.db = get_supabase()
+            self.supabase = self.db.client
         except Exception as e:
             print(f"Supabase connection failed: {e}")
             self.supabase = None
 
-    def get_client(self) -> Client:
+    def get_client(self):
         if not self.supabase:
             self._connect()
         if not self.supabase:
              raise Exception("Supabase client is not initialized")
         return self.supabase
 
-    def upload_file(self, bucket: str, path: str, file_bytes: bytes, content_type: str = "application/octet-stream") -> str:
+    def upload_file(self, bucket: str, path: str, file_bytes: bytes | BinaryIO, content_type: str = "application/octet-stream") -> str:
+        """
+        Uploads bytes or a binary stream. Real files (BufferedReader) are
+        streamed by the storage client instead of being loaded in memory.
+        """
         client = self.get_client()
+        if not isinstance(file_bytes, (bytes, io.BufferedReader, io.FileIO)):
+            # In-memory streams (BytesIO...) are small: the client wants bytes
+            file_bytes = file_bytes.read()
         try:
             client.storage.from_(bucket).upload(
                 path=path,
@@ -37,6 +45,17 @@ class StorageService:
             print(f"Storage upload error: {e}")
             raise e
 
+    async def upload_file_async(self, bucket: str, path: str, file_bytes: bytes | BinaryIO, content_type: str = "application/octet-stream") -> str:
+        """upload_file on the shared async client (doesn't block the event loop)."""
+        self.get_client()
+        if not isinstance(file_bytes, (bytes, io.BufferedReader, io.FileIO)):
+            file_bytes = file_bytes.read()
+        try:
+            return await self.db.upload(bucket, path, file_bytes, content_type)
+        except Exception as e:
+            print(f"Storage upload error: {e}")
+            raise e
+
     def delete_file(self, bucket: str, path: str):
         client = self.get_client()
         try:
@@ -61,10 +80,14 @@ class StorageService:
             print(f"Storage download error: {e}")
             raise e
 
-_storage_service = None
+    async def download_file_async(self, bucket: str, path: str) -> bytes:
+        self.get_client()
+        try:
+            return await self.db.download(bucket, path)
+        except Exception as e:
+            print(f"Storage download error: {e}")
+            raise e
 
 def get_storage_service():
-    global _storage_service
-    if not _storage_service:
-        _storage_service = StorageService()
-    return _storage_service
+    from app.services.registry import get_storage_service
+    return get_storage_service()
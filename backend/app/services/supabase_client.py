@@ -0,0 +1,110 @@
+"""
+Shared Supabase data-access layer.
+
+One sync and one async Supabase client per process, each on its own
+keep-alive httpx pool, shared by every service for PostgREST and Storage
+calls. Async routes use the async helpers so database and storage round
+trips no longer block the event loop; code running in threads (job state
+writer, exports, Drive) keeps using the sync client.
+"""
+import asyncio
+import threading
+import weakref
+import httpx
+from app.config import settings
+
+class SupabaseClients:
+    def __init__(self, url: str = None, key: str = None):
+        self.url = url or settings.SUPABASE_URL
+        self.key = key or settings.SUPABASE_SERVICE_KEY
+        self._client = None
+        self._http = None
+        self._lock = threading.Lock()
+        # Event loop -> its async client, pool and lock: a pool's connections
+        # belong to the loop that opened them, so loops never share one
+        self._async = weakref.WeakKeyDictionary()
+
+    def _pool_options(self) -> dict:
+        return {
+            "limits": httpx.Limits(
+                max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE
+            ),
+            "timeout": httpx.Timeout(settings.SUPABASE_TIMEOUT_SECONDS, connect=10.0),
+        }
+
+    @property
+    def client(self):
+        """The sync client (thread-safe, built on first use)."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from supabase import create_client, ClientOptions
+                    self._http = httpx.Client(**self._pool_options())
+                    # Service key: no user session to persist or refresh
+                    options = ClientOptions(
+                        httpx_client=self._http, auto_refresh_token=False, persist_session=False
+                    )
+                    self._client = create_client(self.url, self.key, options=options)
+        return self._client
+
+    async def get_async_client(self):
+        """The async client of the running event loop (built on first use)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._async.get(loop)
+            if state is None:
+                # Clients of loops that were closed (worker restart, tests)
+                # can't be awaited any more: drop them so their sockets are freed
+                for old_loop in [old for old in self._async if old.is_closed()]:
+                    del self._async[old_loop]
+                state = self._async[loop] = {"client": None, "http": None, "lock": asyncio.Lock()}
+        async with state["lock"]:
+            if state["client"] is None:
+                from supabase import acreate_client, AsyncClientOptions
+                state["http"] = httpx.AsyncClient(**self._pool_options())
+                options = AsyncClientOptions(
+                    httpx_client=state["http"], auto_refresh_token=False, persist_session=False
+                )
+                state["client"] = await acreate_client(self.url, self.key, options=options)
+        return state["client"]
+
+    async def execute(self, build):
+        """
+        Runs a PostgREST query on the async client:
+            await db.execute(lambda c: c.table("receipts").select("*").eq("id", job_id))
+        """
+        client = await self.get_async_client()
+        return await build(client).execute()
+
+    async def upload(self, bucket: str, path: str, data, content_type: str) -> str:
+        """Uploads bytes (or a real file, streamed) and returns its public URL."""
+        client = await self.get_async_client()
+        storage = client.storage.from_(bucket)
+        await storage.upload(
+            path=path,
+            file=data,
+            file_options={"content-type": content_type, "upsert": "true"},
+        )
+        return await storage.get_public_url(path)
+
+    async def download(self, bucket: str, path: str) -> bytes:
+        client = await self.get_async_client()
+        return await client.storage.from_(bucket).download(path)
+
+    async def public_url(self, bucket: str, path: str) -> str:
+        client = await self.get_async_client()
+        return await client.storage.from_(bucket).get_public_url(path)
+
+    async def aclose(self):
+        """Closes the running loop's async client."""
+        with self._lock:
+            state = self._async.pop(asyncio.get_running_loop(), None)
+        if state is not None and state["http"] is not None:
+            await state["http"].aclose()
+
+    def close(self):
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+            self._client = None
@@ -1,11 +1,61 @@
-from PIL import Image
+from PIL import Image, ImageOps
 import io
+from app.config import settings
+
+class ImageTooLargeError(ValueError):
+    pass
 
 def load_image(file_bytes: bytes) -> Image.Image:
     """
     Loads bytes into a PIL Image.
+    Only the header is parsed until pixel data is accessed.
     """
     try:
         return Image.open(io.BytesIO(file_bytes))
     except Exception as e:
         raise ValueError(f"Invalid image data: {e}")
+
+def prepare_image_for_ocr(
+    file_bytes: bytes,
+    max_dimension: int = None,
+    max_pixels: int = None,
+    quality: int = None
+) -> bytes:
+    """
+    Shrinks a photo to what OCR actually needs before it is sent to Vision:
+    EXIF-rotated, grayscale, longest side <= max_dimension, re-encoded as JPEG.
+    Returns the original bytes when they are already the smaller payload.
+    Raises ValueError for unreadable images, ImageTooLargeError for oversized ones.
+    """
+    max_dimension = max_dimension or settings.OCR_IMAGE_MAX_DIMENSION
+    max_pixels = max_pixels or settings.OCR_IMAGE_MAX_PIXELS
+    quality = quality or settings.OCR_IMAGE_QUALITY
+
+    img = load_image(file_bytes)
+    width, height = img.size
+    # Header-only check, before any pixel is decoded
+    if width * height > max_pixels:
+        raise ImageTooLargeError(f"Image too large: {width}x{height} exceeds {max_pixels} pixels")
+
+    orientation = img.getexif().get(0x0112, 1)  # EXIF Orientation tag
+    if orientation == 1 and max(width, height) <= max_dimension and img.mode == "L":
+        # Nothing to gain
+        return file_bytes
+
+    # JPEG only: let the decoder downscale by a power of two while decoding,
+    # which skips most of the decode work for 12MP+ photos
+    if img.format == "JPEG":
+        img.draft("L", (max_dimension, max_dimension))
+
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "L":
+        img = img.convert("L")
+    img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    output = io.BytesIO()
+    img.save(output, format="JPEG", quality=quality, optimize=True)
+    normalized = output.getvalue()
+
+    if orientation == 1 and len(normalized) >= len(file_bytes) and max(width, height) <= max_dimension:
+        return file_bytes
+    return normalized
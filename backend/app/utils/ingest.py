@@ -0,0 +1,166 @@
+import hashlib
+import io
+import threading
+from typing import BinaryIO, Optional
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from app.config import settings
+
+# Multipart framing (boundaries, part headers, form fields) on top of the file itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB."
+    )
+
+class UploadLimitMiddleware:
+    """
+    Caps the request body of the upload endpoints before it is parsed.
+
+    Starlette receives and spools the whole multipart body before the
+    handler runs, so a check in the handler only rejects an oversized file
+    once it is already on disk. `limits` maps paths to their maximum file
+    size: a declared Content-Length over it is refused right away, bodies
+    without one (chunked) are counted as they arrive.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+        limit = max_bytes + FORM_OVERHEAD_BYTES
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse({"detail": _too_large(max_bytes).detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside body parsing: FastAPI passes it on as the response
+                    raise _too_large(max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+class _SpoolReader(io.RawIOBase):
+    """A reader over a SpooledUpload with its own position, like zipfile's _SharedFile."""
+
+    def __init__(self, upload: "SpooledUpload"):
+        self._upload = upload
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._upload.size
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        data = self._upload.read_at(self._pos, len(buffer))
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+class SpooledUpload:
+    """
+    An uploaded file, read in place from the spool Starlette wrote while
+    parsing the request (in memory up to 1MB, then a temp file).
+
+    The content is never copied again: `open()` hands out independent
+    readers over the same spool. FastAPI closes it after the response, so
+    it must not be used by background tasks.
+    """
+
+    def __init__(self, file: BinaryIO, size: int, md5: str,
+                 filename: Optional[str] = None, content_type: Optional[str] = None):
+        self._file = file
+        self._lock = threading.Lock()
+        self.size = size
+        self.md5 = md5
+        self.filename = filename
+        self.content_type = content_type
+
+    @property
+    def on_disk(self) -> bool:
+        """Large enough to be streamed rather than read whole."""
+        return self.size > settings.UPLOAD_SPOOL_MEMORY_BYTES
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """Thread-safe: readers share the spool's file position."""
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(size)
+
+    def open(self) -> BinaryIO:
+        """
+        Returns a fresh readable stream over the content (a BufferedReader,
+        streamed by the storage client). Closing it leaves the spool open.
+        """
+        return io.BufferedReader(_SpoolReader(self), buffer_size=settings.UPLOAD_CHUNK_BYTES)
+
+    def read_bytes(self) -> bytes:
+        return self.read_at(0, self.size)
+
+    def close(self):
+        # The spool belongs to the request: FastAPI closes it
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+async def spool_upload(
+    file: UploadFile,
+    max_bytes: int = None,
+    chunk_size: int = None
+) -> SpooledUpload:
+    """
+    Checks an UploadFile against `max_bytes` (HTTPException 413) and hashes
+    it in chunks, reading Starlette's spool in place. The request body as a
+    whole is capped earlier, by UploadLimitMiddleware.
+    """
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_BYTES
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    md5 = hashlib.md5()
+    size = 0
+    await file.seek(0)
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise _too_large(max_bytes)
+        md5.update(chunk)
+    return SpooledUpload(file.file, size, md5.hexdigest(), file.filename, file.content_type)
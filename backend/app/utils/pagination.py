@@ -0,0 +1,26 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+def encode_cursor(row: dict) -> str:
+    """Opaque keyset cursor pointing after `row` in (created_at, id) order."""
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Returns (created_at, id). Raises ValueError for malformed cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        raise ValueError("Invalid cursor")
+    # Both values end up in a PostgREST filter string: only a timestamp and a UUID are accepted
+    try:
+        datetime.fromisoformat(created_at)
+        row_id = str(uuid.UUID(row_id))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
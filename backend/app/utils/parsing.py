@@ -1,5 +1,8 @@
 import re
 from typing import Optional
+from app.utils.text_scan import scan_text
+
+_NON_NUMERIC_RE = re.compile(r"[^\d.,-]")
 
 def parse_amount(value: Optional[str | float | int]) -> Optional[float]:
     """
@@ -19,7 +22,7 @@ def parse_amount(value: Optional[str | float | int]) -> Optional[float]:
         # 1. Remove spaces and currency symbols (keep digits, dots, commas, minus)
         # We also remove letters just in case
         clean = value.replace(" ", "").replace("€", "").replace("EUR", "").replace("$", "")
-        clean = re.sub(r"[^\d.,-]", "", clean)
+        clean = _NON_NUMERIC_RE.sub("", clean)
 
         if not clean:
             return None
@@ -56,44 +59,20 @@ def parse_amount(value: Optional[str | float | int]) -> Optional[float]:
 
 def extract_amount_from_text(text: str) -> Optional[float]:
     """
-    Fallback regex extraction for amount from OCR text.
+    Fallback extraction of the amount from OCR text.
     Prioritizes lines with 'Total', 'Montant', etc.
     """
-    # Normalize text: replace commas with dots for float parsing
-    normalized_text = text.replace(',', '.')
-    
-    # Regex to find amounts like 12.50, 1,200.00
-    # We look for lines containing "Total" or "Montant" first
-    # Case insensitive
-    total_patterns = [
-        r'(?i)(total|montant|somme|payé|net à payer|ttc).{0,20}(\d+\.\d{2})',
-        r'(?i)(total|montant|somme|payé|net à payer|ttc).{0,20}(\d+)'
-    ]
-    
-    for pattern in total_patterns:
-        matches = re.findall(pattern, normalized_text)
-        if matches:
-            # Return the last one found (often the grand total)
-            try:
-                val = float(matches[-1][-1])
-                if val > 0:
-                    return val
-            except:
-                pass
-    
-    # Fallback: Find all currency-like numbers and take the max
+    scan = scan_text(text)
+
+    # Return the last total found (often the grand total), decimals first
+    for totals in (scan.totals, scan.total_integers):
+        if totals and totals[-1] > 0:
+            return totals[-1]
+
+    # Fallback: take the largest currency-like number
     # This is risky but better than 0 for a fallback if we are desperate
-    amounts = re.findall(r'(\d+\.\d{2})', normalized_text)
-    valid_amounts = []
-    for amt in amounts:
-        try:
-            val = float(amt)
-            if 0 < val < 10000: # Sanity check
-                valid_amounts.append(val)
-        except:
-            continue
-    
+    valid_amounts = [amount for amount in scan.amounts if 0 < amount < 10000]  # Sanity check
     if valid_amounts:
         return max(valid_amounts)
-        
+
     return None
@@ -0,0 +1,49 @@
+import io
+import pypdfium2 as pdfium
+
+# Kept free of app imports: this module is loaded by every render worker process.
+
+POINTS_PER_INCH = 72
+
+def render_scale(width_pt: float, height_pt: float, dpi: int, max_dimension: int) -> float:
+    """
+    Scale factor for rendering a page at `dpi`, reduced so the longest side
+    stays within `max_dimension` pixels (large-format pages).
+    """
+    scale = dpi / POINTS_PER_INCH
+    longest = max(width_pt, height_pt) * scale
+    if longest > max_dimension:
+        scale *= max_dimension / longest
+    return scale
+
+def render_pdf_pages(
+    pdf_bytes: bytes,
+    page_indices: list[int],
+    dpi: int = 200,
+    max_dimension: int = 2048,
+    image_format: str = "JPEG",
+    quality: int = 85
+) -> list[bytes]:
+    """
+    Renders the given pages as grayscale images encoded for OCR.
+    Runs inside a process pool worker, so it only takes picklable arguments.
+    """
+    pdf = pdfium.PdfDocument(pdf_bytes)
+    images = []
+    try:
+        for index in page_indices:
+            page = pdf[index]
+            width, height = page.get_size()
+            bitmap = page.render(scale=render_scale(width, height, dpi, max_dimension), grayscale=True)
+            pil_image = bitmap.to_pil()
+
+            output = io.BytesIO()
+            if image_format == "PNG":
+                pil_image.save(output, format="PNG", optimize=True)
+            else:
+                pil_image.save(output, format=image_format, quality=quality)
+            images.append(output.getvalue())
+            page.close()
+    finally:
+        pdf.close()
+    return images
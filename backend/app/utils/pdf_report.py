@@ -0,0 +1,140 @@
+import io
+from functools import lru_cache
+import pypdfium2 as pdfium
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+# Kept free of app imports: report chunks are rendered in worker processes.
+# Styles are built once per process and shared by every document.
+
+@lru_cache(maxsize=1)
+def get_styles():
+    return getSampleStyleSheet()
+
+INFO_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
+REPORT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+    ('LINEBELOW', (0, 0), (-1, -1), 0.25, colors.lightgrey),
+])
+
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+])
+
+# Per-row commands, applied to (0, row)..(-1, row)
+CATEGORY_ROW_COMMANDS = [('FONTNAME', 'Helvetica-Bold'), ('BACKGROUND', colors.beige)]
+SUBTOTAL_ROW_COMMANDS = [('FONTNAME', 'Helvetica-Bold'), ('LINEABOVE', 1, colors.black)]
+
+REPORT_HEADER = ["Date", "Merchant", "Category", "Amount", "VAT", "Currency"]
+REPORT_COL_WIDTHS = [62, 200, 80, 62, 52, 50]
+
+# Rows per Table flowable. Platypus re-measures a table each time it splits
+# it across pages, so one huge table costs O(n^2); page-sized ones stay linear.
+ROWS_PER_TABLE = 40
+
+def _money(value) -> str:
+    return f"{value:.2f}" if value is not None else ""
+
+def render_report_summary(title: str, subtitle: str, totals: list[tuple]) -> bytes:
+    """
+    First page of the report: one line per (category, currency) with the
+    receipt count, amount and VAT subtotals, then a grand total line.
+    """
+    styles = get_styles()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, title=title)
+    data = [["Category", "Currency", "Receipts", "Amount", "VAT"]]
+    count_total = 0
+    for category, currency, count, amount, vat in totals:
+        data.append([category, currency, count, _money(amount), _money(vat)])
+        count_total += count
+    data.append(["Total", "", count_total, "", ""])
+
+    table = Table(data, colWidths=[140, 70, 70, 90, 90], repeatRows=1)
+    table.setStyle(SUMMARY_TABLE_STYLE)
+    doc.build([
+        Paragraph(title, styles['Title']),
+        Paragraph(subtitle, styles['Normal']),
+        Spacer(1, 20),
+        table,
+        Spacer(1, 40),
+        Paragraph("Generated automatically by NovaReceipt", styles['Italic']),
+    ])
+    return buffer.getvalue()
+
+def render_report_chunk(lines: list[tuple]) -> bytes:
+    """
+    Renders one slice of the report detail as a standalone PDF.
+    `lines` are ("category", name), ("receipt", date, merchant, category,
+    amount, vat, currency) or ("subtotal", name, count, amount, vat, currency).
+    Runs inside a process pool worker, so it only takes picklable arguments.
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=36, bottomMargin=36)
+    elements = []
+    for start in range(0, len(lines), ROWS_PER_TABLE):
+        data = [REPORT_HEADER]
+        row_styles = []
+        for line in lines[start:start + ROWS_PER_TABLE]:
+            row = len(data)
+            kind = line[0]
+            if kind == "category":
+                data.append([line[1], "", "", "", "", ""])
+                row_styles += [(cmd, (0, row), (-1, row), *args) for cmd, *args in CATEGORY_ROW_COMMANDS]
+            elif kind == "subtotal":
+                _, name, count, amount, vat, currency = line
+                data.append(["", f"Subtotal {name} ({count})", "", _money(amount), _money(vat), currency])
+                row_styles += [(cmd, (0, row), (-1, row), *args) for cmd, *args in SUBTOTAL_ROW_COMMANDS]
+            else:
+                _, date, merchant, category, amount, vat, currency = line
+                data.append([date or "", (merchant or "")[:40], category or "", _money(amount), _money(vat), currency or ""])
+
+        table = Table(data, colWidths=REPORT_COL_WIDTHS)
+        table.setStyle(REPORT_TABLE_STYLE)
+        if row_styles:
+            table.setStyle(TableStyle(row_styles))
+        elements.append(table)
+    doc.build(elements)
+    return buffer.getvalue()
+
+def merge_pdfs(parts: list[bytes]) -> bytes:
+    """Concatenates PDFs page by page without re-rendering them."""
+    merged = pdfium.PdfDocument.new()
+    try:
+        for part in parts:
+            src = pdfium.PdfDocument(part)
+            try:
+                merged.import_pages(src)
+            finally:
+                src.close()
+        output = io.BytesIO()
+        merged.save(output)
+        return output.getvalue()
+    finally:
+        merged.close()
@@ -0,0 +1,115 @@
+"""
+Compaction of OCR text before it is put in an LLM prompt.
+
+Prompt tokens drive both the cost and the time-to-first-token of a parse,
+and raw OCR text carries a lot that never helps extraction: PDF page
+banners, headers/footers repeated on every page, separator rules, card
+terminal slips and legal boilerplate. This drops those lines. It also
+removes non-amount lines already seen on an earlier page. If the text is
+still over the token budget, it keeps the header (merchant), every
+total/VAT/date line and as much of the rest as fits, in the original
+order.
+"""
+import math
+import re
+from app.utils.text_scan import TOTAL_KEYWORDS, VAT_KEYWORDS
+
+# Bump when the compaction rules change: parses cached for the old output are not reused
+COMPACTION_VERSION = "2"
+# Rough tokenizer-free estimate: ~4 characters per token for receipt text
+CHARS_PER_TOKEN = 4
+# Lines always kept at the top of the text (merchant name, address)
+HEADER_LINES = 8
+GAP_MARKER = "[...]"
+
+_PAGE_BANNER_RE = re.compile(r"^-{2,}\s*page\s+\d+.*-{2,}$", re.IGNORECASE)
+_NO_ALNUM_RE = re.compile(r"^[\W_]*$")
+_AMOUNT_RE = re.compile(r"\d+[.,]\d{2}(?!\d)")
+_KEEP_RE = re.compile(
+    "|".join(map(re.escape, TOTAL_KEYWORDS + VAT_KEYWORDS + ("net a payer", "a payer")))
+    + r"|\bht\b|\d{2}[/-]\d{2}[/-]\d{2,4}|\d{4}[/-]\d{2}[/-]\d{2}",
+    re.IGNORECASE
+)
+# Card terminal slips, legal mentions, marketing footers
+_NOISE_RE = re.compile(
+    r"ticket client|a conserver|à conserver|sans contact|carte bancaire|\bcontrat\b|\bterminal\b"
+    r"|\bno auto\b|\baid\b|a0000000|\*{4,}\d{2,4}|transaction|debit|débit"
+    r"|conditions g[ée]n[ée]rales|si[èe]ge social|capital de|\brcs\b|\bsiret\b|\bnaf\b|\bape\b"
+    r"|www\.|https?://|@|merci de votre|a bient[ôo]t|à bient[ôo]t|bonne journ[ée]e"
+    r"|conservez|[ée]change|remboursement|service client|horaires",
+    re.IGNORECASE
+)
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _is_noise(line: str) -> bool:
+    if _PAGE_BANNER_RE.match(line) or _NO_ALNUM_RE.match(line):
+        return True
+    # A noise keyword only drops the line when it carries nothing to extract
+    return bool(_NOISE_RE.search(line)) and not _KEEP_RE.search(line) and not _AMOUNT_RE.search(line)
+
+def compact_ocr_text(text: str, max_tokens: int = None) -> tuple[str, dict]:
+    """
+    Returns the compacted text and its stats (lines and estimated tokens
+    before/after, whether the budget forced lines out).
+    """
+    # line -> page it first appeared on
+    seen = {}
+    page = 0
+    lines = []
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        if _PAGE_BANNER_RE.match(line):
+            page += 1
+            continue
+        if not line or _is_noise(line):
+            continue
+        if not _AMOUNT_RE.search(line):
+            # Headers/footers repeated on every page: only dropped when an
+            # earlier page had them, so identical lines on one page (two of
+            # the same article) are kept
+            key = line.casefold()
+            if seen.setdefault(key, page) != page:
+                continue
+        lines.append(line)
+
+    truncated = False
+    if max_tokens and estimate_tokens("\n".join(lines)) > max_tokens:
+        truncated = True
+        lines = _fit_budget(lines, max_tokens)
+
+    compacted = "\n".join(lines)
+    tokens_before = estimate_tokens(text)
+    tokens_after = estimate_tokens(compacted)
+    return compacted, {
+        "lines_before": text.count("\n") + 1 if text else 0,
+        "lines_after": len(lines),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "truncated": truncated,
+    }
+
+def _fit_budget(lines: list[str], max_tokens: int) -> list[str]:
+    budget = max_tokens * CHARS_PER_TOKEN
+    keep = set(range(min(HEADER_LINES, len(lines))))
+    keep.update(i for i, line in enumerate(lines) if _KEEP_RE.search(line))
+    used = sum(len(lines[i]) + 1 for i in keep)
+
+    # Fill what is left in document order
+    for i, line in enumerate(lines):
+        if i not in keep and used + len(line) + 1 <= budget:
+            keep.add(i)
+            used += len(line) + 1
+
+    result = []
+    previous = -1
+    for i in sorted(keep):
+        if i != previous + 1:
+            result.append(GAP_MARKER)
+        result.append(lines[i])
+        previous = i
+    if previous != len(lines) - 1:
+        result.append(GAP_MARKER)
+    return result
@@ -0,0 +1,133 @@
+"""
+Shared scan of OCR text for the heuristic extractors.
+
+The text is scanned once: keyword occurrences are located with plain
+substring search on the lower-cased text, and the amounts, dates and lines
+the extractors ask for are read with precompiled patterns, each at most once
+and only when first needed (most receipts never need the full amount list).
+The extractors (ParserService, utils.parsing) read this instead of running
+their own regexes over the whole text. Scans are cached per text, so the
+parser and the LLM amount fallback share one.
+"""
+import re
+from functools import cached_property, lru_cache
+from typing import Optional
+
+TOTAL_KEYWORDS = ("total", "montant", "somme", "payé", "net à payer", "ttc")
+VAT_KEYWORDS = ("tva", "vat", "tax")
+
+# Category hints (ExpenseCategory names), in priority order: first category with a hit wins
+CATEGORY_KEYWORDS = (
+    ("RESTAURANT", ("restaurant", "food", "burger", "pizza", "cafe", "coffee", "starbucks", "mcdo", "brasserie")),
+    ("TAXI", ("uber", "taxi", "bolt", "heetch")),
+    ("TRANSPORT", ("train", "sncf", "ratp", "transport", "flight", "air france", "easyjet")),
+    ("HOTEL", ("hotel", "airbnb", "logement")),
+    ("ESSENCE", ("essence", "fuel", "carburant", "gazole", "totalenergies", "shell", "parking", "peage", "péage")),
+    ("COURSES", ("carrefour", "leclerc", "auchan", "lidl", "monoprix", "franprix", "intermarche", "supermarche")),
+)
+
+# How far after its keyword (same line) an amount still belongs to it
+TOTAL_WINDOW = 20
+VAT_WINDOW = 10
+
+# Longest first, so "taxi" is not also counted as "tax"
+_ALL_KEYWORDS = sorted(
+    set(TOTAL_KEYWORDS) | set(VAT_KEYWORDS) | {w for _, words in CATEGORY_KEYWORDS for w in words},
+    key=len, reverse=True
+)
+# Whole numbers only ("112,50" is never read as "2,50": matches start at the
+# first digit), with optional thousands separators ("1.234,56", "1,234.56")
+_AMOUNT_RE = re.compile(r"\d+(?:[.,]\d{3})*[.,]\d{2}(?!\d)")
+_INTEGER_RE = re.compile(r"(?<![\d.,])\d+(?![\d.,]?\d)")
+_DATE_DMY_RE = re.compile(r"\d{2}[/-]\d{2}[/-]\d{4}")
+_DATE_YMD_RE = re.compile(r"\d{4}[/-]\d{2}[/-]\d{2}")
+_NUMERIC_LINE_RE = re.compile(r"[\d\s.\-/]+")
+
+def _amount_value(token: str) -> float:
+    # The last separator is the decimal one, any other is a thousands separator
+    return float(token[:-3].replace(",", "").replace(".", "") + "." + token[-2:])
+
+class TextScan:
+    def __init__(self, text: str):
+        self.text = text
+        self.lower = text.lower()
+        # keyword -> end offsets of its occurrences
+        self.hits = {}
+        claimed = set()
+        for keyword in _ALL_KEYWORDS:
+            start = self.lower.find(keyword)
+            while start != -1:
+                if start not in claimed:
+                    claimed.add(start)
+                    self.hits.setdefault(keyword, []).append(start + len(keyword))
+                start = self.lower.find(keyword, start + 1)
+        self.keywords = frozenset(self.hits)
+
+    def _amounts_after(self, keywords, window: int) -> list[tuple[int, float]]:
+        """(offset, value) of amounts starting within `window` chars after a keyword, same line."""
+        found = {}
+        for keyword in keywords:
+            for end in self.hits.get(keyword, ()):
+                line_end = self.text.find("\n", end)
+                if line_end == -1:
+                    line_end = len(self.text)
+                for match in _AMOUNT_RE.finditer(self.text, end, min(line_end, end + window + 16)):
+                    if match.start() - end <= window:
+                        found[match.start()] = _amount_value(match.group())
+        return sorted(found.items())
+
+    def head(self, count: int) -> list[str]:
+        """First `count` non-empty lines, stripped (without splitting the whole text)."""
+        lines = []
+        start = 0
+        while len(lines) < count and start <= len(self.text):
+            end = self.text.find("\n", start)
+            if end == -1:
+                end = len(self.text)
+            line = self.text[start:end].strip()
+            if line:
+                lines.append(line)
+            start = end + 1
+        return lines
+
+    @cached_property
+    def amounts(self) -> list[float]:
+        """Every amount of the text, in order."""
+        return [_amount_value(m.group()) for m in _AMOUNT_RE.finditer(self.text)]
+
+    @cached_property
+    def totals(self) -> list[float]:
+        """Amounts right after a total keyword, in order (the last is usually the grand total)."""
+        return [value for _, value in self._amounts_after(TOTAL_KEYWORDS, TOTAL_WINDOW)]
+
+    @cached_property
+    def vat_amounts(self) -> list[float]:
+        return [value for _, value in self._amounts_after(VAT_KEYWORDS, VAT_WINDOW)]
+
+    @cached_property
+    def total_integers(self) -> list[float]:
+        """Whole numbers right after a total keyword (amounts printed without cents)."""
+        found = {}
+        for keyword in TOTAL_KEYWORDS:
+            for end in self.hits.get(keyword, ()):
+                line_end = self.text.find("\n", end)
+                if line_end == -1:
+                    line_end = len(self.text)
+                for match in _INTEGER_RE.finditer(self.text, end, min(line_end, end + TOTAL_WINDOW + 16)):
+                    if match.start() - end <= TOTAL_WINDOW:
+                        found[match.start()] = float(match.group())
+        return [value for _, value in sorted(found.items())]
+
+    @cached_property
+    def date(self) -> Optional[str]:
+        """First dd/mm/yyyy date of the text, else its first yyyy-mm-dd."""
+        match = _DATE_DMY_RE.search(self.text) or _DATE_YMD_RE.search(self.text)
+        return match.group() if match else None
+
+def is_numeric_line(line: str) -> bool:
+    """Only digits, spaces and . - / (dates, codes, amounts)."""
+    return _NUMERIC_LINE_RE.fullmatch(line) is not None
+
+@lru_cache(maxsize=64)
+def scan_text(text: str) -> TextScan:
+    return TextScan(text)
@@ -0,0 +1,184 @@
+"""
+Standalone receipt processing worker.
+
+Claims queued jobs from jobs_processing with a lease and runs
+process_receipt_job_v2 for each, outside the web process. Run as many
+workers as needed, on one machine or several:
+
+    python -m app.worker --concurrency 8
+
+Set JOB_DISPATCH=queue on the web service so /upload and /process enqueue
+jobs instead of running them as BackgroundTasks.
+
+With LLM_BATCH_ENABLED, bulk receipts that need the LLM wait for the Batch
+API; one batch runner submits and collects those batches:
+
+    python -m app.worker --llm-batches
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import traceback
+import uuid
+from app.config import settings
+from app.services.job_queue import QueuedJob
+from app.services.events import job_event
+from app.services.registry import get_job_queue, get_jobs_service, get_llm_batch_service, get_event_bus
+
+class Worker:
+    def __init__(
+        self,
+        queue,
+        concurrency: int = settings.WORKER_CONCURRENCY,
+        lease_seconds: int = settings.WORKER_LEASE_SECONDS,
+        poll_interval: float = settings.WORKER_POLL_INTERVAL,
+        max_attempts: int = settings.WORKER_MAX_ATTEMPTS,
+        worker_id: str = None
+    ):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._active: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self._slot_freed = asyncio.Event()
+
+    def stop(self):
+        """Stops claiming new jobs; running jobs are allowed to finish."""
+        self._stopping.set()
+        self._slot_freed.set()
+
+    async def run(self, drain: bool = False):
+        """
+        Polls the queue until stop() is called. With drain=True the worker
+        returns as soon as the queue is empty and all jobs have finished.
+        """
+        print(f"[worker {self.worker_id}] Started (concurrency={self.concurrency})")
+        while not self._stopping.is_set():
+            free_slots = self.concurrency - len(self._active)
+            if free_slots <= 0:
+                self._slot_freed.clear()
+                await self._slot_freed.wait()
+                continue
+
+            try:
+                jobs = await asyncio.to_thread(self.queue.claim, self.worker_id, free_slots, self.lease_seconds)
+            except Exception as e:
+                print(f"[worker {self.worker_id}] Claim failed: {e}")
+                jobs = []
+
+            for job in jobs:
+                task = asyncio.create_task(self._run_job(job))
+                self._active.add(task)
+                task.add_done_callback(self._on_job_done)
+
+            if not jobs:
+                if drain and not self._active:
+                    break
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+        if self._active:
+            await asyncio.gather(*self._active, return_exceptions=True)
+        print(f"[worker {self.worker_id}] Stopped")
+
+    def _on_job_done(self, task: asyncio.Task):
+        self._active.discard(task)
+        self._slot_freed.set()
+
+    async def _run_job(self, job: QueuedJob):
+        # Imported here: the pipeline lives with the upload routes
+        from app.routers.upload import process_receipt_job_v2
+
+        print(f"[worker {self.worker_id}] Job {job.id} (receipt {job.receipt_id}), attempt {job.attempts}")
+        heartbeat = asyncio.create_task(self._keep_lease(job))
+        try:
+            await process_receipt_job_v2(job.request, raise_errors=True)
+            await asyncio.to_thread(self.queue.complete, job)
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            try:
+                if job.attempts < self.max_attempts:
+                    # Exponential backoff: 10s, 20s, 40s...
+                    delay = 10 * 2 ** (job.attempts - 1)
+                    print(f"[worker {self.worker_id}] Job {job.id} failed, retrying in {delay}s: {error}")
+                    await asyncio.to_thread(self.queue.retry, job, error, delay)
+                else:
+                    print(f"[worker {self.worker_id}] Job {job.id} failed permanently: {error}")
+                    await asyncio.to_thread(self.queue.fail, job, error)
+                    await asyncio.to_thread(get_jobs_service().mark_job_error, job.receipt_id, error)
+                    get_event_bus().publish(job.receipt_id, job_event("ERROR", "failed", error=error))
+            except Exception:
+                traceback.print_exc()
+        finally:
+            heartbeat.cancel()
+
+    async def _keep_lease(self, job: QueuedJob):
+        # Renew well before expiry so long PDFs are not picked up by another worker
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.queue.extend_lease, job, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                print(f"[worker {self.worker_id}] Lease renewal failed for {job.id}: {e}")
+
+async def _run_llm_batches(args):
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:
+            # Windows
+            pass
+    await get_llm_batch_service().run(stopping, drain=args.drain)
+
+async def _main(args):
+    try:
+        await _run(args)
+    finally:
+        await get_event_bus().close()
+
+async def _run(args):
+    if args.llm_batches:
+        await _run_llm_batches(args)
+        return
+    worker = Worker(
+        get_job_queue(),
+        concurrency=args.concurrency,
+        lease_seconds=args.lease_seconds,
+        poll_interval=args.poll_interval
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:
+            # Windows
+            pass
+    await worker.run(drain=args.drain)
+    get_jobs_service().flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="NovaReceipt processing worker")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    parser.add_argument("--lease-seconds", type=int, default=settings.WORKER_LEASE_SECONDS)
+    parser.add_argument("--poll-interval", type=float, default=settings.WORKER_POLL_INTERVAL)
+    parser.add_argument("--drain", action="store_true", help="Exit once the queue is empty")
+    parser.add_argument(
+        "--llm-batches", action="store_true",
+        help="Run the LLM Batch API runner instead of processing jobs (one per deployment)"
+    )
+    args = parser.parse_args()
+
+    settings.validate_env()
+    asyncio.run(_main(args))
+
+if __name__ == "__main__":
+    main()
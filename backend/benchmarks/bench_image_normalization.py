@@ -0,0 +1,75 @@
+"""
+Payload size and preprocessing cost of prepare_image_for_ocr.
+
+Runs over a directory of receipt photos (JPEG/PNG). Without --corpus a
+synthetic corpus of phone-sized photos is generated. Vision latency itself
+is not measured here; it scales with the uploaded payload size.
+
+Usage (from backend/):
+    python -m benchmarks.bench_image_normalization --corpus ~/receipts
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import time
+
+from PIL import Image, ImageDraw
+
+from app.utils.image_loader import prepare_image_for_ocr
+
+
+def _synthetic_corpus(count: int):
+    rng = random.Random(42)
+    sizes = [(4032, 3024, "JPEG"), (3000, 4000, "JPEG"), (2448, 3264, "PNG")]
+    for i in range(count):
+        width, height, fmt = sizes[i % len(sizes)]
+        img = Image.effect_noise((width, height), 40).convert("RGB")
+        draw = ImageDraw.Draw(img)
+        for line in range(60):
+            y = 100 + line * (height - 200) // 60
+            draw.text((width // 5, y), f"ARTICLE {rng.randint(1, 999):>3}   {rng.uniform(1, 99):6.2f} EUR", fill=(20, 20, 20))
+        buf = io.BytesIO()
+        img.save(buf, format=fmt, quality=92)
+        yield f"synthetic_{i}.{fmt.lower()}", buf.getvalue()
+
+
+def _directory_corpus(path: str):
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+            with open(os.path.join(path, name), "rb") as f:
+                yield name, f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of receipt images")
+    parser.add_argument("--count", type=int, default=6, help="Synthetic images to generate without --corpus")
+    args = parser.parse_args()
+
+    corpus = _directory_corpus(args.corpus) if args.corpus else _synthetic_corpus(args.count)
+
+    total_in = total_out = 0
+    timings = []
+    for name, data in corpus:
+        start = time.perf_counter()
+        out = prepare_image_for_ocr(data)
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        total_in += len(data)
+        total_out += len(out)
+        print(f"{name:<28} {len(data) / 1e6:7.2f} MB -> {len(out) / 1e6:6.2f} MB  {elapsed * 1000:7.1f} ms")
+
+    if not timings:
+        print("No images found")
+        return
+    print(
+        f"\n{len(timings)} images: {total_in / 1e6:.1f} MB -> {total_out / 1e6:.1f} MB "
+        f"({100 * (1 - total_out / total_in):.0f}% smaller), "
+        f"median preprocessing {statistics.median(timings) * 1000:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Concurrent request latency: blocking OCR vs. OCRService.extract_text_async.
+
+Google Vision is replaced by a fake client that sleeps for a fixed
+round-trip time, so the numbers only reflect how the event loop schedules
+the work. A heartbeat task measures how long the loop is stalled.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ocr_concurrency --requests 20 --latency 0.3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.services.ocr import OCRService
+
+
+class _FakeResponse:
+    class _Error:
+        message = ""
+
+    class _Annotation:
+        description = "FAKE RECEIPT\nTOTAL 12,50 EUR"
+
+    error = _Error()
+    text_annotations = [_Annotation()]
+
+
+class FakeVisionClient:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def text_detection(self, image):
+        time.sleep(self.latency)
+        return _FakeResponse()
+
+
+async def _heartbeat(stop: asyncio.Event, lags: list, interval: float = 0.01):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def _run(service: OCRService, n_requests: int, use_async: bool):
+    # All requests "arrive" at the same instant, so latency is measured from
+    # the shared start time rather than from when each handler got scheduled.
+    async def handler(start: float):
+        if use_async:
+            await service.extract_text_async(b"fake-image", mime_type="image/jpeg")
+        else:
+            service.extract_text(b"fake-image", mime_type="image/jpeg")
+        return time.perf_counter() - start
+
+    stop = asyncio.Event()
+    lags = []
+    heartbeat = asyncio.create_task(_heartbeat(stop, lags))
+    await asyncio.sleep(0)
+
+    wall_start = time.perf_counter()
+    latencies = await asyncio.gather(*(handler(wall_start) for _ in range(n_requests)))
+    wall = time.perf_counter() - wall_start
+
+    stop.set()
+    await heartbeat
+    return wall, latencies, max(lags) if lags else 0.0
+
+
+def _report(label: str, wall: float, latencies: list, max_lag: float):
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(
+        f"{label:<8} wall={wall:6.2f}s  "
+        f"p50={statistics.median(latencies):6.2f}s  p95={p95:6.2f}s  "
+        f"max loop stall={max_lag * 1000:8.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Simulated Vision round trip in seconds")
+    args = parser.parse_args()
+
+    service = OCRService()
+    service.client = FakeVisionClient(args.latency)
+
+    print(f"{args.requests} concurrent requests, {args.latency * 1000:.0f}ms simulated Vision latency")
+    _report("before", *asyncio.run(_run(service, args.requests, use_async=False)))
+    _report("after", *asyncio.run(_run(service, args.requests, use_async=True)))
+
+
+if __name__ == "__main__":
+    main()
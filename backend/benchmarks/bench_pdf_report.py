@@ -0,0 +1,66 @@
+"""
+Scaling of the batch PDF expense report.
+
+Renders synthetic receipts rows with PDFExportService.generate_report and
+reports wall time, time per receipt, page count and the parent's peak RSS.
+Time per receipt should stay flat as the report grows (the first run also
+pays for spawning the render workers).
+
+Usage (from backend/):
+    python -m benchmarks.bench_pdf_report --receipts 1000 5000 20000
+"""
+import argparse
+import random
+import resource
+import time
+
+import pypdfium2 as pdfium
+
+from app.config import settings
+from app.services.registry import get_pdf_export_service
+
+CATEGORIES = ["RESTAURANT", "COURSES", "TAXI", "HOTEL", "ESSENCE", "AUTRE"]
+
+
+def _rows(count: int):
+    rng = random.Random(42)
+    for i in range(count):
+        amount = round(rng.uniform(2, 400), 2)
+        yield {
+            "merchant": f"Merchant {rng.randint(1, 5000)}",
+            "date": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "amount": amount,
+            "vat_amount": round(amount / 6, 2),
+            "currency": "EUR" if i % 10 else "USD",
+            "category": CATEGORIES[i % len(CATEGORIES)],
+        }
+
+
+def _max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--workers", type=int, help=f"Override PDF_REPORT_WORKERS ({settings.PDF_REPORT_WORKERS})")
+    args = parser.parse_args()
+    if args.workers is not None:
+        settings.PDF_REPORT_WORKERS = args.workers
+
+    for count in args.receipts:
+        start = time.perf_counter()
+        pdf_bytes = get_pdf_export_service().generate_report(_rows(count))
+        elapsed = time.perf_counter() - start
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        pages = len(pdf)
+        pdf.close()
+        print(
+            f"{count:>7} receipts  {elapsed:7.2f} s  {elapsed / count * 1000:6.2f} ms/receipt  "
+            f"{pages:>5} pages  {len(pdf_bytes) / 1e6:6.1f} MB  "
+            f"max RSS {_max_rss_mb():6.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
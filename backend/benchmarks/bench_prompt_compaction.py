@@ -0,0 +1,99 @@
+"""
+Estimated OCR tokens put in the LLM prompt, before and after compaction.
+
+Runs app.utils.text_compaction over OCR texts (a directory of .txt files
+dumped from receipt_artifacts, or synthetic single- and multi-page receipts)
+and reports the tokens saved per receipt, whether the budget had to cut
+lines, and that every total/VAT/date line survived.
+
+Usage (from backend/):
+    python -m benchmarks.bench_prompt_compaction
+    python -m benchmarks.bench_prompt_compaction --corpus ./ocr_texts --max-tokens 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+from app.config import settings
+from app.utils.text_compaction import compact_ocr_text, _KEEP_RE
+
+FOOTER = [
+    "********************************",
+    "CARTE BANCAIRE SANS CONTACT",
+    "A0000000421010",
+    "NO AUTO: {auth}",
+    "TICKET CLIENT A CONSERVER",
+    "SIEGE SOCIAL 93 AVENUE DE PARIS 91300 MASSY",
+    "SAS AU CAPITAL DE 2 000 000 EUR RCS EVRY 451 321 335",
+    "MERCI DE VOTRE VISITE - A BIENTOT",
+    "www.example-market.fr",
+]
+
+
+def _synthetic(count: int):
+    rng = random.Random(7)
+    for n in range(count):
+        pages = 1 if n % 3 else rng.randint(2, 6)
+        header = ["MARKET DU CENTRE", "12 RUE DE LA PAIX 75002 PARIS", "TEL 01 23 45 67 89", "-" * 32]
+        parts = []
+        total = 0.0
+        for page in range(pages):
+            parts.append(f"--- Page {page + 1} (OCR) ---")
+            parts += header
+            for _ in range(rng.randint(15, 40)):
+                amount = round(rng.uniform(0.5, 40), 2)
+                total += amount
+                parts.append(f"ARTICLE {rng.randint(1, 300)}    {amount:.2f}".replace(".", ","))
+            parts.append("=" * 32)
+        parts += [
+            f"TOTAL TTC {total:.2f}".replace(".", ","),
+            f"TVA 20% {total / 6:.2f}".replace(".", ","),
+            f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2026",
+        ]
+        parts += [line.format(auth=rng.randint(100000, 999999)) for line in FOOTER]
+        yield f"synthetic-{n}", "\n".join(parts)
+
+
+def _corpus(path: str):
+    for name in sorted(os.listdir(path)):
+        if name.endswith(".txt"):
+            with open(os.path.join(path, name), encoding="utf-8") as f:
+                yield name, f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of OCR .txt files (default: synthetic receipts)")
+    parser.add_argument("--receipts", type=int, default=300, help="Synthetic receipts to generate")
+    parser.add_argument("--max-tokens", type=int, default=settings.LLM_PROMPT_MAX_OCR_TOKENS)
+    parser.add_argument("--verbose", action="store_true", help="One line per receipt")
+    args = parser.parse_args()
+
+    texts = list(_corpus(args.corpus) if args.corpus else _synthetic(args.receipts))
+    saved, ratios, truncated, lost = [], [], 0, 0
+    start = time.perf_counter()
+    for name, text in texts:
+        compacted, stats = compact_ocr_text(text, args.max_tokens)
+        saved.append(stats["tokens_saved"])
+        ratios.append(stats["tokens_saved"] / stats["tokens_before"] if stats["tokens_before"] else 0.0)
+        truncated += stats["truncated"]
+        kept = set(compacted.splitlines())
+        lost += sum(
+            1 for line in text.splitlines()
+            if _KEEP_RE.search(line) and " ".join(line.split()) not in kept
+        )
+        if args.verbose:
+            print(f"{name:<24} {stats['tokens_before']:>6} -> {stats['tokens_after']:>6} tokens"
+                  f"{'  (cut to budget)' if stats['truncated'] else ''}")
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(texts)} receipts, budget {args.max_tokens} tokens, {elapsed / len(texts) * 1e3:.2f} ms/receipt")
+    print(f"tokens saved per receipt: mean {statistics.mean(saved):.0f}, median {statistics.median(saved):.0f}, "
+          f"max {max(saved)} ({statistics.mean(ratios):.0%} of the OCR text on average)")
+    print(f"cut to budget: {truncated}, total/VAT/date lines lost: {lost}")
+
+
+if __name__ == "__main__":
+    main()
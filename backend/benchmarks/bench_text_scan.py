@@ -0,0 +1,155 @@
+"""
+Per-receipt cost of the heuristic text extractors.
+
+Runs the regex heuristics (ParserService fields with their confidences and
+the amount fallback of utils.parsing) over synthetic OCR texts, once the old
+way (every extractor compiling and running its own patterns over the whole
+text) and once through the shared single-pass scan of app.utils.text_scan.
+Also counts receipts where the two disagree on a field.
+
+Usage (from backend/):
+    python -m benchmarks.bench_text_scan --receipts 2000 --lines 60
+"""
+import argparse
+import random
+import re
+import time
+
+from app.services.parser import ParserService
+from app.utils.parsing import extract_amount_from_text
+from app.utils.text_scan import scan_text
+
+MERCHANTS = ["CARREFOUR MARKET", "STARBUCKS COFFEE", "UBER BV", "HOTEL IBIS", "STATION SHELL", "FNAC"]
+PRODUCTS = ["PAIN", "LAIT", "POMMES", "CAFE CREME", "EAU MINERALE", "FROMAGE", "JAMBON", "SAVON"]
+
+
+def _receipts(count: int, lines: int):
+    rng = random.Random(42)
+    for _ in range(count):
+        items = [(rng.choice(PRODUCTS), round(rng.uniform(0.5, 60), 2)) for _ in range(lines)]
+        total = round(sum(amount for _, amount in items), 2)
+        body = [
+            rng.choice(MERCHANTS),
+            f"{rng.randint(1, 99)} RUE DE LA PAIX 75002 PARIS",
+            f"SIRET {rng.randint(100, 999)} {rng.randint(100, 999)} {rng.randint(100, 999)} 00012",
+            f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2026 {rng.randint(8, 20)}:{rng.randint(0, 59):02d}",
+        ]
+        body += [f"{name} {amount:.2f} EUR".replace(".", ",") for name, amount in items]
+        body += [
+            f"TOTAL TTC {total:.2f}".replace(".", ","),
+            f"TVA 20% {total / 6:.2f}".replace(".", ","),
+            f"CB VISA **** {rng.randint(1000, 9999)}",
+            "MERCI DE VOTRE VISITE",
+        ]
+        yield "\n".join(body)
+
+
+# --- Before the shared scan: each extractor runs its own regexes ---
+
+def _legacy_fields(text: str) -> dict:
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+    merchant = "Unknown Merchant"
+    for line in lines[:5]:
+        if len(line) > 2 and not re.match(r"^[\d\s\.\-\/]+$", line):
+            merchant = line
+            break
+
+    date = None
+    for pattern in (r"(\d{2}[/-]\d{2}[/-]\d{4})", r"(\d{4}[/-]\d{2}[/-]\d{2})"):
+        match = re.search(pattern, text)
+        if match:
+            date = match.group(1)
+            break
+
+    normalized = text.replace(",", ".")
+    amount = 0.0
+    totals = re.findall(r"(?i)(total|montant|somme|payé).{0,20}(\d+\.\d{2})", normalized)
+    if totals:
+        amount = float(totals[-1][1])
+    else:
+        amounts = [float(a) for a in re.findall(r"(\d+\.\d{2})", normalized) if float(a) < 10000]
+        amount = max(amounts) if amounts else 0.0
+
+    vats = re.findall(r"(?i)(tva|vat|tax).{0,10}(\d+\.\d{2})", normalized)
+    vat = max(float(m[1]) for m in vats) if vats else 0.0
+
+    text_lower, merchant_lower = text.lower(), merchant.lower()
+    category = "Autre"
+    for label, words in (
+        ("Restaurant", ["restaurant", "food", "burger", "pizza", "cafe", "coffee", "starbucks", "mcdo"]),
+        ("Transport", ["uber", "taxi", "train", "sncf", "transport", "flight", "parking"]),
+        ("Logement", ["hotel", "airbnb", "logement"]),
+        ("Carburant", ["essence", "fuel", "total", "shell", "bp"]),
+    ):
+        if any(x in text_lower or x in merchant_lower for x in words):
+            category = label
+            break
+
+    fallback = None
+    for pattern in (
+        r"(?i)(total|montant|somme|payé|net à payer|ttc).{0,20}(\d+\.\d{2})",
+        r"(?i)(total|montant|somme|payé|net à payer|ttc).{0,20}(\d+)",
+    ):
+        matches = re.findall(pattern, normalized)
+        if matches and float(matches[-1][-1]) > 0:
+            fallback = float(matches[-1][-1])
+            break
+    else:
+        amounts = [float(a) for a in re.findall(r"(\d+\.\d{2})", normalized) if 0 < float(a) < 10000]
+        fallback = max(amounts) if amounts else None
+
+    return {"merchant": merchant, "date": date, "amount": amount, "vat": vat,
+            "category": category, "fallback": fallback}
+
+
+def _scan_fields(parser: ParserService, text: str) -> dict:
+    receipt, _ = parser.parse_with_confidence(text)
+    return {
+        "merchant": receipt.merchant,
+        "date": receipt.date,
+        "amount": receipt.amount or 0.0,
+        "vat": receipt.vat_amount or 0.0,
+        "category": receipt.category,
+        "fallback": extract_amount_from_text(text),  # reuses the cached scan
+    }
+
+
+def _time(label: str, extract, texts, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        scan_text.cache_clear()
+        start = time.perf_counter()
+        for text in texts:
+            extract(text)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<8} {best / len(texts) * 1e6:8.1f} us/receipt")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=40, help="Item lines per receipt")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = list(_receipts(args.receipts, args.lines))
+    service = ParserService()
+    print(f"{len(texts)} receipts, {args.lines + 8} lines each (best of {args.repeat})")
+    legacy = _time("legacy", _legacy_fields, texts, args.repeat)
+    scanned = _time("scan", lambda text: _scan_fields(service, text), texts, args.repeat)
+    print(f"speedup  {legacy / scanned:8.2f}x")
+
+    scan_text.cache_clear()
+    differing = {}
+    for text in texts:
+        old, new = _legacy_fields(text), _scan_fields(service, text)
+        # Date (now ISO) and category (now ExpenseCategory) changed format on purpose
+        for field in ("merchant", "amount", "vat", "fallback"):
+            if old[field] != new[field]:
+                differing[field] = differing.get(field, 0) + 1
+    print(f"fields differing from legacy: {differing or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
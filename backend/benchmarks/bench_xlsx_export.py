@@ -0,0 +1,92 @@
+"""
+Time and peak Python memory of the multi-receipt XLSX export.
+
+Feeds synthetic receipts rows (3 line items each) to
+ExcelExportService.write_receipts and reports wall time, peak traced
+memory (measured in a separate run) and file size. With --pandas the
+same rows are also exported the old way (DataFrames built in memory,
+then written) for comparison.
+
+Usage (from backend/):
+    python -m benchmarks.bench_xlsx_export --rows 10000 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from app.services.registry import get_excel_export_service
+
+CATEGORIES = ["RESTAURANT", "COURSES", "TAXI", "HOTEL", "ESSENCE", "AUTRE"]
+
+
+def _rows(count: int):
+    rng = random.Random(42)
+    for i in range(count):
+        amount = round(rng.uniform(2, 400), 2)
+        yield {
+            "id": f"00000000-0000-4000-8000-{i:012d}",
+            "created_at": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}T12:00:00+00:00",
+            "status": "success",
+            "merchant": f"Merchant {rng.randint(1, 5000)}",
+            "date": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "amount": amount,
+            "vat_amount": round(amount / 6, 2),
+            "currency": "EUR",
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "items": [
+                {"description": f"Article {j}", "amount": round(amount / 3, 2), "vat": 20.0}
+                for j in range(3)
+            ],
+        }
+
+
+def _export_pandas(rows, path: str):
+    import pandas as pd
+
+    rows = list(rows)
+    summary = pd.DataFrame([{k: v for k, v in row.items() if k != "items"} for row in rows])
+    items = pd.DataFrame([
+        {"id": row["id"], "merchant": row["merchant"], **item}
+        for row in rows for item in row["items"]
+    ])
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        summary.to_excel(writer, index=False, sheet_name="Receipts")
+        items.to_excel(writer, index=False, sheet_name="Line Items")
+
+
+def _measure(label: str, export, count: int):
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        export(_rows(count), path)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        # Second run for memory only: tracing slows the export down several times
+        tracemalloc.start()
+        export(_rows(count), path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        os.remove(path)
+    print(f"{label:<12} {count:>8} rows  {elapsed:7.2f} s  peak {peak / 1e6:7.1f} MB  file {size / 1e6:6.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--pandas", action="store_true", help="Also run the in-memory pandas export")
+    args = parser.parse_args()
+
+    for count in args.rows:
+        _measure("write-only", get_excel_export_service().write_receipts, count)
+        if args.pandas:
+            _measure("pandas", _export_pandas, count)
+
+
+if __name__ == "__main__":
+    main()
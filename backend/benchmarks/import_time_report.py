@@ -0,0 +1,116 @@
+"""
+Cold-start import time of the API, tracked over releases.
+
+Imports the target module in fresh interpreters with `python -X importtime`,
+reports the median total and the slowest modules of the median run, and
+appends the result to a JSON-lines history file so regressions show up as
+a jump against the previous entry.
+
+Usage (from backend/):
+    python -m benchmarks.import_time_report
+    python -m benchmarks.import_time_report --runs 10 --top 15 --max-ms 800
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+DEFAULT_HISTORY = os.path.join(os.path.dirname(__file__), "import_time_history.jsonl")
+
+
+def _import_once(module: str) -> dict:
+    """Cumulative import time (us) per module for one fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  self [us] | cumulative | name" (name indented by depth)
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        # A module can only be imported once per process: keep the first
+        timings.setdefault(name, int(cumulative_us))
+    if module not in timings:
+        raise RuntimeError(f"{module} missing from -X importtime output:\n{result.stderr[-2000:]}")
+    return timings
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _last_entry(path: str):
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                last = json.loads(line)
+    return last
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest third-party/app modules to list")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON-lines file to append to")
+    parser.add_argument("--no-record", action="store_true", help="Don't append to the history file")
+    parser.add_argument("--max-ms", type=float, help="Exit with status 1 above this total")
+    args = parser.parse_args()
+
+    runs = [_import_once(args.module) for _ in range(args.runs)]
+    runs.sort(key=lambda timings: timings[args.module])
+    median_run = runs[len(runs) // 2]
+    total_ms = median_run[args.module] / 1000
+
+    # Top-level packages only (their cumulative time includes submodules)
+    packages = {}
+    for name, cumulative_us in median_run.items():
+        if name != args.module:
+            root = name.split(".")[0]
+            packages[root] = max(packages.get(root, 0), cumulative_us)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    print(f"import {args.module}: median {total_ms:.0f} ms over {args.runs} runs "
+          f"(min {runs[0][args.module] / 1000:.0f}, max {runs[-1][args.module] / 1000:.0f})")
+    for name, cumulative_us in slowest:
+        print(f"  {name:<28} {cumulative_us / 1000:8.1f} ms")
+
+    previous = _last_entry(args.history)
+    if previous and previous.get("module") == args.module:
+        delta = total_ms - previous["total_ms"]
+        print(f"vs {previous['revision']} ({previous['recorded_at'][:10]}): {previous['total_ms']:.0f} ms, {delta:+.0f} ms")
+
+    if not args.no_record:
+        entry = {
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "module": args.module,
+            "runs": args.runs,
+            "total_ms": round(total_ms, 1),
+            "slowest": {name: round(us / 1000, 1) for name, us in slowest},
+        }
+        with open(args.history, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"FAIL: {total_ms:.0f} ms exceeds --max-ms {args.max_ms:.0f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
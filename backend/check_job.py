@@ -1,6 +1,8 @@
-from app.services.jobs import jobs_service
+from app.services.registry import get_jobs_service
 import sys
 
+jobs_service = get_jobs_service()
+
 job_id = "6c018365-c62c-4929-bb3c-90dde0468c43"
 if len(sys.argv) > 1:
     job_id = sys.argv[1]
@@ -1,7 +1,9 @@
 import asyncio
-from app.services.jobs import jobs_service
+from app.services.registry import get_jobs_service
 import uuid
 
+jobs_service = get_jobs_service()
+
 def test_job_lifecycle():
     job_id = str(uuid.uuid4())
     print(f"Testing Job ID: {job_id}")
@@ -22,6 +24,7 @@ def test_job_lifecycle():
     print("Marked as error.")
 
     # 4. Verify Error
+    jobs_service.flush()  # Status writes are buffered
     job = jobs_service.get_job(job_id)
     print(f"Job State (Error): {job['status']}, Error: {job['error']}")
 
@@ -41,6 +44,7 @@ def test_job_lifecycle():
     print("Marked as ready.")
 
     # 6. Verify Ready
+    jobs_service.flush()  # Status writes are buffered
     job = jobs_service.get_job(job_id)
     print(f"Job State (Ready): {job['status']}")
     print(f"Receipt Data: {job.get('receipt_data')}")
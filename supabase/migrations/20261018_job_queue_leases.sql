@@ -0,0 +1,61 @@
+-- Durable job queue: lets backend workers (python -m app.worker) claim
+-- jobs_processing rows with a lease instead of running them in the web process.
+
+-- 1. Lease / scheduling columns
+ALTER TABLE public.jobs_processing
+ADD COLUMN IF NOT EXISTS payload jsonb,
+ADD COLUMN IF NOT EXISTS locked_by text,
+ADD COLUMN IF NOT EXISTS lease_expires_at timestamptz,
+ADD COLUMN IF NOT EXISTS available_at timestamptz DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS idx_jobs_processing_claim
+ON public.jobs_processing(status, available_at);
+
+-- Set by the Next.js upload route, used to rebuild the job payload
+ALTER TABLE public.receipts
+ADD COLUMN IF NOT EXISTS file_type text;
+
+-- 2. Atomically claim up to p_limit jobs for one worker.
+-- Picks queued jobs that are due plus processing jobs whose lease expired
+-- (crashed worker) or that have no lease (a stale status write after the
+-- lease was released). SKIP LOCKED lets many workers poll concurrently.
+CREATE OR REPLACE FUNCTION public.claim_receipt_jobs(
+  p_worker_id text,
+  p_limit int,
+  p_lease_seconds int
+)
+RETURNS TABLE (id uuid, receipt_id uuid, attempts int, payload jsonb)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+  WITH claimable AS (
+    SELECT j.id
+    FROM public.jobs_processing j
+    WHERE (j.status = 'queued' AND coalesce(j.available_at, now()) <= now())
+       OR (j.status = 'processing' AND coalesce(j.lease_expires_at, '-infinity') < now())
+    ORDER BY j.created_at
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  )
+  UPDATE public.jobs_processing j
+  SET status = 'processing',
+      attempts = coalesce(j.attempts, 0) + 1,
+      locked_by = p_worker_id,
+      lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+      updated_at = now()
+  FROM claimable c, public.receipts r
+  WHERE j.id = c.id AND r.id = j.receipt_id
+  RETURNING j.id, j.receipt_id, j.attempts,
+    coalesce(j.payload, jsonb_build_object(
+      'receipt_id', r.id,
+      'file_path', r.file_path,
+      'file_type', coalesce(r.file_type, 'application/octet-stream'),
+      'user_id', coalesce(r.user_id::text, 'anonymous')
+    ));
+$$;
+
+-- Workers call it with the service key only: clients must not claim jobs or
+-- read other users' payloads through /rpc/claim_receipt_jobs
+REVOKE EXECUTE ON FUNCTION public.claim_receipt_jobs(text, int, int) FROM public, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.claim_receipt_jobs(text, int, int) TO service_role;
@@ -0,0 +1,25 @@
+-- Receipts waiting for (or parsed through) the OpenAI Batch API.
+-- Written by the backend (bulk jobs with LLM_BATCH_ENABLED), consumed by
+-- `python -m app.worker --llm-batches`. The OCR text is read from
+-- receipt_artifacts when the batch is built.
+CREATE TABLE IF NOT EXISTS public.llm_batch_items (
+    receipt_id uuid PRIMARY KEY REFERENCES public.receipts(id) ON DELETE CASCADE,
+    status text NOT NULL DEFAULT 'pending',   -- pending, submitted, done, error
+    batch_id text,                             -- OpenAI batch id once submitted
+    request jsonb NOT NULL,                    -- ProcessRequest payload
+    attempts integer NOT NULL DEFAULT 0,
+    error text,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_batch_items_pending
+ON public.llm_batch_items(created_at)
+WHERE status = 'pending';
+
+CREATE INDEX IF NOT EXISTS idx_llm_batch_items_batch
+ON public.llm_batch_items(batch_id)
+WHERE status = 'submitted';
+
+-- Backend only (service key): no client policies
+ALTER TABLE public.llm_batch_items ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,15 @@
+-- OCR text and processing traces, moved out of receipts.raw_json so list
+-- and export queries don't drag them along. payload is the zlib-compressed,
+-- base64-encoded JSON {"ocr_text", "debug"}; read lazily by the backend.
+CREATE TABLE IF NOT EXISTS public.receipt_artifacts (
+    receipt_id uuid PRIMARY KEY REFERENCES public.receipts(id) ON DELETE CASCADE,
+    encoding text NOT NULL DEFAULT 'zlib+base64',
+    payload text NOT NULL,
+    raw_size integer,
+    stored_size integer,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- Backend only (service key): no client policies
+ALTER TABLE public.receipt_artifacts ENABLE ROW LEVEL SECURITY;
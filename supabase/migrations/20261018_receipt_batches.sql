@@ -0,0 +1,10 @@
+-- Bulk upload: receipts created by one /upload/bulk call share a batch_id
+ALTER TABLE public.receipts
+ADD COLUMN IF NOT EXISTS batch_id uuid,
+ADD COLUMN IF NOT EXISTS original_filename text,
+-- Bulk rows record their MIME type (also added by the job queue migration)
+ADD COLUMN IF NOT EXISTS file_type text;
+
+CREATE INDEX IF NOT EXISTS idx_receipts_batch_id
+ON public.receipts(batch_id)
+WHERE batch_id IS NOT NULL;
@@ -0,0 +1,8 @@
+-- Receipt lists and exports page newest first on (created_at, id):
+-- WHERE user_id = $1 AND (created_at, id) < ($2, $3) ORDER BY created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_receipts_user_created_id
+ON public.receipts(user_id, created_at DESC, id DESC);
+
+-- Same order without a user filter (admin / debugging lists)
+CREATE INDEX IF NOT EXISTS idx_receipts_created_id
+ON public.receipts(created_at DESC, id DESC);